@@ -1,12 +1,78 @@
+import io
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
 from google.cloud import bigquery
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import functools
+from itertools import repeat
 import logging
 
-
-def setup_logging(table_id):
+from flush_staging import stage_parquet
+from parquet_cache import prepare_parquet
+
+SOURCE_FILE = (
+    Path(__file__).parents[2]
+    / "data/external/2024-10-21_gridVeg_additional_species_SOURCE.csv"
+)
+
+logger = logging.getLogger(__name__)
+
+# Typed Parquet copy of SOURCE_FILE, rebuilt whenever the CSV or the way it is
+# parsed changes
+PARQUET_CACHE = (
+    Path(__file__).parents[2]
+    / "data/interim/2024-10-21_gridVeg_additional_species.parquet"
+)
+
+# Only these source columns are uploaded
+SOURCE_COLUMNS = [
+    "Survey Data::__kp_Survey",
+    "Survey Data::_kf_Site",
+    "Survey Data::SurveyDate",
+    "Survey Data::SurveyYear",
+    "_kf_Species_serial",
+]
+
+# How the CSV is read: only the uploaded columns, typed at parse time by the
+# multithreaded pyarrow parser into Arrow-backed columns
+SOURCE_READ_OPTIONS = {
+    "usecols": SOURCE_COLUMNS,
+    "dtype": {
+        "Survey Data::__kp_Survey": "string[pyarrow]",
+        "Survey Data::_kf_Site": "int64[pyarrow]",
+        "Survey Data::SurveyYear": "int64[pyarrow]",
+        "_kf_Species_serial": "int64[pyarrow]",
+    },
+    "parse_dates": ["Survey Data::SurveyDate"],
+    # The export writes dates as m/d/yy
+    "date_format": "%m/%d/%y",
+    "engine": "pyarrow",
+    "dtype_backend": "pyarrow",
+}
+
+# Arrow schema of the Parquet upload, matching the BigQuery table schema
+PARQUET_SCHEMA = pa.schema(
+    [
+        ("survey_ID", pa.string()),
+        ("grid_point", pa.int64()),
+        ("date", pa.date32()),
+        ("year", pa.int64()),
+        ("key_plant_species", pa.int64()),
+    ]
+)
+
+
+@functools.cache
+def connect_to_bigquery():
+    """Create a BigQuery client, reused for the rest of the process"""
+    return bigquery.Client()
+
+
+def setup_logging(table_id, verbose=False):
     """Setup logging for BigQuery updates."""
     # Create logs directory if it doesn't exist
     log_dir = Path(__file__).parents[2] / "logs"
@@ -17,7 +83,8 @@ def setup_logging(table_id):
     table_name = table_id.split(".")[-1]
     log_file = log_dir / f"bigquery_update_{table_name}_{timestamp}.log"
 
-    # Configure logging
+    # Configure logging (force replaces handlers left by an earlier table
+    # processed in the same worker)
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s - %(levelname)s - %(message)s",
@@ -25,8 +92,12 @@ def setup_logging(table_id):
             logging.FileHandler(log_file),
             logging.StreamHandler(),  # Also print to console
         ],
+        force=True,
     )
-    return logging.getLogger(__name__)
+
+    # Debug output is limited to this module, not third-party clients
+    logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+    return logger
 
 
 def parse_args():
@@ -37,7 +108,11 @@ def parse_args():
     parser.add_argument(
         "--table",
         required=True,
-        help="BigQuery table ID (format: project.dataset.table)",
+        nargs="+",
+        help=(
+            "BigQuery table ID(s) (format: project.dataset.table); "
+            "multiple tables are processed in parallel"
+        ),
     )
     parser.add_argument(
         "--backup-bucket",
@@ -48,84 +123,133 @@ def parse_args():
         action="store_true",
         help="Validate and preview the upload without performing it",
     )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        help="Stream the CSV in chunks of this many rows to bound memory use",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Log column dtypes and per-column null counts",
+    )
+    parser.add_argument(
+        "--staging-dir",
+        help=(
+            "Write Parquet to this GCS staging area instead of loading it; "
+            "load once per day with flush_staging.py (format: gs://bucket/prefix)"
+        ),
+    )
     return parser.parse_args()
 
 
+def read_source_csv():
+    """Read the additional species source CSV."""
+    df = pd.read_csv(SOURCE_FILE, **SOURCE_READ_OPTIONS)
+    return df
+
+
+def prepare_source_parquet():
+    """Convert the source CSV to a typed Parquet file unless it is up to date."""
+    return prepare_parquet(
+        SOURCE_FILE,
+        PARQUET_CACHE,
+        read_source_csv,
+        (SOURCE_READ_OPTIONS, PARQUET_SCHEMA),
+    )
+
+
 def load_data():
-    """Load the additional species data from CSV file."""
-    file_path = (
-        Path(__file__).parents[2]
-        / "data/external/2024-10-21_gridVeg_additional_species_SOURCE.csv"
+    """Load the additional species data from its Parquet copy of the CSV."""
+    # Parquet decodes much faster than re-parsing the CSV and keeps the dtypes
+    return pd.read_parquet(
+        prepare_source_parquet(),
+        columns=SOURCE_COLUMNS,
+        engine="pyarrow",
+        dtype_backend="pyarrow",
+    )
+
+
+def load_data_chunks(chunksize):
+    """Load the additional species data from CSV file in chunks."""
+    # The pyarrow engine does not support chunksize, so stream with the C parser.
+    # survey_ID is still stored in Arrow so transform_data slices it natively.
+    return pd.read_csv(
+        SOURCE_FILE,
+        usecols=SOURCE_COLUMNS,
+        dtype={
+            "Survey Data::__kp_Survey": "string[pyarrow]",
+            "Survey Data::_kf_Site": "Int64",
+            "Survey Data::SurveyYear": "Int64",
+            "_kf_Species_serial": "Int64",
+        },
+        parse_dates=["Survey Data::SurveyDate"],
+        date_format="%m/%d/%y",
+        chunksize=chunksize,
     )
-    df = pd.read_csv(file_path)
-    return df
 
 
 def transform_data(df):
     """Transform the data to match BigQuery schema."""
-    # Create a copy to avoid modifying original
-    df_transformed = df.copy()
-
-    # Rename columns to match BigQuery schema
-    df_transformed = df_transformed.rename(
+    # Rename columns to match BigQuery schema. The renamed frame shares data
+    # with the original; column assignments below replace whole columns, so
+    # the caller's frame is left untouched without a full copy.
+    df_transformed = df.rename(
         columns={
             "Survey Data::__kp_Survey": "survey_ID",
             "Survey Data::_kf_Site": "grid_point",
             "Survey Data::SurveyDate": "date",
             "Survey Data::SurveyYear": "year",
             "_kf_Species_serial": "key_plant_species",
-        }
+        },
+        copy=False,
     )
 
-    # Convert date format from MM/DD/YYYY to datetime
-    df_transformed["date"] = pd.to_datetime(
-        df_transformed["date"]
-    )  # Keep as datetime object
+    # Dates, grid points and species are already typed by load_data
 
-    # Convert grid_point to integer
-    df_transformed["grid_point"] = pd.to_numeric(df_transformed["grid_point"])
+    # Take first 8 characters of UUID for survey_ID. survey_ID is Arrow-backed,
+    # so str.slice runs pyarrow's utf8_slice_codeunits kernel over the column
+    df_transformed["survey_ID"] = df_transformed["survey_ID"].str.slice(0, 8)
 
-    # Handle empty species values and convert to integer
-    df_transformed["key_plant_species"] = (
-        df_transformed["key_plant_species"]
-        .replace("", pd.NA)  # Replace empty strings with NA
-        .astype("Int64")  # Convert to nullable integer type
-    )
-
-    # Take first 8 characters of UUID for survey_ID
-    df_transformed["survey_ID"] = df_transformed["survey_ID"].str[:8]
-
-    # Add validation print
-    print("\nColumn types after transformation:")
-    print(df_transformed.dtypes)
+    # Only walk the column dtypes when they will actually be logged
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Column types after transformation:\n%s", df_transformed.dtypes)
 
     return df_transformed
 
 
 def validate_data(df):
     """Validate the transformed data."""
-    print("\nData Validation:")
-    print(f"Total records: {len(df)}")
-    print(f"Null values in key columns:")
-    print(df.isnull().sum())
-    print("\nData types:")
-    print(df.dtypes)
-
-    return all(
-        [
-            df["grid_point"].notnull().all(),
-            df["date"].notnull().all(),
-            df["year"].notnull().all(),
-        ]
-    )
+    logger.info("Data Validation:")
+    logger.info(f"Total records: {len(df)}")
+
+    # The full-table null report is only computed when debug logging is on;
+    # otherwise a single pass over the required columns suffices
+    required_columns = ["grid_point", "date", "year"]
+    if logger.isEnabledFor(logging.DEBUG):
+        null_counts = df.isnull().sum()
+        logger.debug("Null values in key columns:\n%s", null_counts)
+        logger.debug("Data types:\n%s", df.dtypes)
+    else:
+        null_counts = df[required_columns].isnull().sum()
 
+    return bool((null_counts[required_columns] == 0).all())
 
-def upload_to_bigquery(df, table_id, dry_run=True):
-    """Upload the transformed data to BigQuery."""
-    client = bigquery.Client()
+
+def to_arrow_table(df):
+    """Convert transformed data to an Arrow table matching the upload schema."""
+    # The native timestamp column is cast to date32 by Arrow, so BigQuery loads
+    # it straight into DATE without a per-row strftime or .dt.date pass
+    return pa.Table.from_pandas(df, schema=PARQUET_SCHEMA, preserve_index=False)
+
+
+def upload_parquet(buffer, table_id):
+    """Load an in-memory Parquet buffer into BigQuery with one append job."""
+    client = connect_to_bigquery()
 
     # Configure the load job
     job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
         write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
         schema=[
             bigquery.SchemaField("survey_ID", "STRING"),
@@ -136,22 +260,37 @@ def upload_to_bigquery(df, table_id, dry_run=True):
         ],
     )
 
+    job = client.load_table_from_file(buffer, table_id, job_config=job_config)
+    job.result()  # Wait for the job to complete
+
+
+def upload_to_bigquery(df, table_id, dry_run=True):
+    """Upload the transformed data to BigQuery."""
     if dry_run:
         # Dry run mode - just validate and show statistics
         try:
             # Validate data types match schema
             schema_types = {
-                "survey_ID": "object",
-                "grid_point": "int64",
-                "date": "datetime64[ns]",  # Updated to match datetime type
-                "year": "int64",
-                "key_plant_species": "Int64",
+                "grid_point": "int64[pyarrow]",
+                "year": "int64[pyarrow]",
+                "key_plant_species": "int64[pyarrow]",
             }
 
-            # Check if data types match expected schema
+            # Check if data types match expected schema. survey_ID is "string"
+            # or "string[pyarrow]" depending on the pandas version, and the
+            # Arrow timestamp unit depends on the parser, so both are checked
+            # separately (pandas 2.2 does not count Arrow timestamps as
+            # datetime64)
             current_types = df.dtypes.to_dict()
-            type_matches = all(
-                str(current_types[col]) == dtype for col, dtype in schema_types.items()
+            date_dtype = current_types["date"]
+            type_matches = (
+                all(
+                    str(current_types[col]) == dtype
+                    for col, dtype in schema_types.items()
+                )
+                and pd.api.types.is_string_dtype(current_types["survey_ID"])
+                and isinstance(date_dtype, pd.ArrowDtype)
+                and pa.types.is_timestamp(date_dtype.pyarrow_dtype)
             )
 
             if type_matches:
@@ -174,6 +313,8 @@ def upload_to_bigquery(df, table_id, dry_run=True):
                     "Schema validation failed - data types don't match expected schema"
                 )
                 print("\nExpected types:")
+                print("survey_ID: string")
+                print("date: timestamp[pyarrow]")
                 for col, dtype in schema_types.items():
                     print(f"{col}: {dtype}")
                 print("\nActual types:")
@@ -182,17 +323,18 @@ def upload_to_bigquery(df, table_id, dry_run=True):
         except Exception as e:
             print(f"Dry run validation failed: {e}")
     else:
-        # Setup logging for actual upload
-        logger = setup_logging(table_id)
-
         # Actual upload
         try:
             logger.info(f"Starting upload to {table_id}")
             logger.info(f"Total rows to upload: {len(df)}")
             logger.info(f"Date range: {df['date'].min()} to {df['date'].max()}")
 
-            job = client.load_table_from_dataframe(df, table_id, job_config=job_config)
-            job.result()  # Wait for the job to complete
+            # Serialize to an in-memory Parquet buffer
+            buffer = io.BytesIO()
+            pq.write_table(to_arrow_table(df), buffer, compression="snappy")
+            buffer.seek(0)
+
+            upload_parquet(buffer, table_id)
 
             logger.info(f"Successfully uploaded {len(df)} rows to BigQuery")
             logger.info("Upload completed successfully")
@@ -207,7 +349,7 @@ def upload_to_bigquery(df, table_id, dry_run=True):
 
 def backup_table(table_id, backup_bucket):
     """Backup BigQuery table to Cloud Storage."""
-    client = bigquery.Client()
+    client = connect_to_bigquery()
 
     # Create timestamp for backup file
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -230,9 +372,83 @@ def backup_table(table_id, backup_bucket):
         return False
 
 
-def main():
-    # Parse command line arguments
-    args = parse_args()
+def stream_to_parquet(chunksize):
+    """Transform and validate the CSV chunk by chunk into one Parquet buffer.
+
+    Returns the buffer, the number of rows written and whether every chunk
+    passed validation.
+    """
+    buffer = io.BytesIO()
+    total_rows = 0
+    valid = True
+
+    with pq.ParquetWriter(buffer, PARQUET_SCHEMA, compression="snappy") as writer:
+        for chunk in load_data_chunks(chunksize):
+            chunk_transformed = transform_data(chunk)
+            valid = validate_data(chunk_transformed) and valid
+            writer.write_table(to_arrow_table(chunk_transformed))
+            total_rows += len(chunk_transformed)
+
+    buffer.seek(0)
+    return buffer, total_rows, valid
+
+
+def stream_pipeline(table_id, backup_bucket, chunksize, staging_dir=None):
+    """Stream the CSV to a single table in chunks, keeping memory flat."""
+    print(f"Streaming data in chunks of {chunksize} rows...")
+    try:
+        buffer, total_rows, valid = stream_to_parquet(chunksize)
+    except Exception as e:
+        logger.error(f"Error converting data to Parquet: {e}")
+        print(f"Error converting data to Parquet: {e}")
+        return
+
+    if not valid:
+        print("Data validation failed. Please check the data before uploading.")
+        return
+
+    print("\nData validation passed!")
+
+    # Staged data is backed up and loaded later by flush_staging.py
+    if staging_dir:
+        stage_parquet(buffer, table_id, staging_dir)
+        return
+
+    # Create backup if bucket specified
+    if backup_bucket:
+        print(f"\nCreating backup in bucket: {backup_bucket}")
+        if not backup_table(table_id, backup_bucket):
+            print("Backup failed. Aborting upload.")
+            return
+
+    try:
+        logger.info(f"Starting streamed upload to {table_id}")
+        logger.info(f"Total rows to upload: {total_rows}")
+
+        upload_parquet(buffer, table_id)
+
+        logger.info(f"Successfully uploaded {total_rows} rows to BigQuery")
+        print(f"\nSuccessfully uploaded {total_rows} rows to BigQuery")
+    except Exception as e:
+        logger.error(f"Error uploading to BigQuery: {e}")
+        print(f"Error uploading to BigQuery: {e}")
+
+
+def pipeline(
+    table_id,
+    backup_bucket=None,
+    dry_run=True,
+    chunksize=None,
+    staging_dir=None,
+    verbose=False,
+):
+    """Load, transform, validate and upload the data to a single table."""
+    setup_logging(table_id, verbose)
+
+    # Dry runs preview the full frame; only real uploads are streamed
+    if chunksize and not dry_run:
+        stream_pipeline(table_id, backup_bucket, chunksize, staging_dir)
+        return
 
     # Load the data
     print("Loading data...")
@@ -251,20 +467,61 @@ def main():
         print("\nFirst few rows of transformed data:")
         print(df_transformed.head())
 
-        if args.dry_run:
-            upload_to_bigquery(df_transformed, args.table, dry_run=True)
+        if dry_run:
+            upload_to_bigquery(df_transformed, table_id, dry_run=True)
+        elif staging_dir:
+            # Staged data is backed up and loaded later by flush_staging.py
+            buffer = io.BytesIO()
+            pq.write_table(to_arrow_table(df_transformed), buffer, compression="snappy")
+            stage_parquet(buffer, table_id, staging_dir)
         else:
             # Create backup if bucket specified
-            if args.backup_bucket:
-                print(f"\nCreating backup in bucket: {args.backup_bucket}")
-                if not backup_table(args.table, args.backup_bucket):
+            if backup_bucket:
+                print(f"\nCreating backup in bucket: {backup_bucket}")
+                if not backup_table(table_id, backup_bucket):
                     print("Backup failed. Aborting upload.")
                     return
 
-            upload_to_bigquery(df_transformed, args.table, dry_run=False)
+            upload_to_bigquery(df_transformed, table_id, dry_run=False)
     else:
         print("Data validation failed. Please check the data before uploading.")
 
 
+def main():
+    # Parse command line arguments
+    args = parse_args()
+
+    if len(args.table) == 1:
+        pipeline(
+            args.table[0],
+            args.backup_bucket,
+            args.dry_run,
+            args.chunk_size,
+            args.staging_dir,
+            args.verbose,
+        )
+        return
+
+    # Convert the CSV once up front so parallel workers share the Parquet copy
+    if not args.chunk_size:
+        prepare_source_parquet()
+
+    # Each table's pipeline is independent and I/O-bound (CSV read + BigQuery
+    # load), so run them in separate processes. Every worker creates its own
+    # BigQuery client and writes a log file named after its table.
+    with ProcessPoolExecutor(max_workers=len(args.table)) as executor:
+        list(
+            executor.map(
+                pipeline,
+                args.table,
+                repeat(args.backup_bucket),
+                repeat(args.dry_run),
+                repeat(args.chunk_size),
+                repeat(args.staging_dir),
+                repeat(args.verbose),
+            )
+        )
+
+
 if __name__ == "__main__":
     main()
@@ -7,6 +7,7 @@ survey dates and identify any discrepancies.
 from google.cloud import bigquery
 import pandas as pd
 from datetime import datetime
+import hashlib
 import logging
 import os
 
@@ -23,12 +24,34 @@ logging.basicConfig(
     ],
 )
 
+# Local cache for query results, invalidated when any source table changes
+CACHE_DIR = "data/interim"
+SOURCE_TABLES = [
+    "mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_additional_species",
+    "mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_survey_metadata",
+    "mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_point_intercept_vegetation",
+    "mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_ground_cover_metadata",
+]
+
+# Columns shown for each sample record
+SAMPLE_COLUMNS = [
+    "survey_ID",
+    "species_date",
+    "metadata_date",
+    "intercept_date",
+    "ground_date",
+]
+
 def connect_to_bigquery():
     """Create a BigQuery client"""
     return bigquery.Client()
 
 def compare_dates_across_tables(client):
-    """Compare dates between additional_species and other gridVeg tables"""
+    """Compare dates between additional_species and other gridVeg tables
+
+    Returns one row per status with its record count and up to five sample
+    records (earliest species_date first), aggregated in BigQuery.
+    """
     query = """
     WITH additional_species AS (
         SELECT DISTINCT
@@ -58,73 +81,93 @@ def compare_dates_across_tables(client):
             date as ground_date
         FROM 
             `mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_ground_cover_metadata`
-    )
-    SELECT 
-        a.survey_ID,
-        a.species_date,
-        m.metadata_date,
-        p.intercept_date,
-        g.ground_date,
-        CASE 
-            WHEN a.species_date > '2024-12-31' THEN 'Future Date'
-            WHEN a.species_date != m.metadata_date THEN 'Date Mismatch'
-            ELSE 'Match'
-        END as status,
-        COUNT(*) OVER(PARTITION BY 
+    ),
+    classified AS (
+        SELECT
+            a.survey_ID,
+            a.species_date,
+            m.metadata_date,
+            p.intercept_date,
+            g.ground_date,
             CASE 
                 WHEN a.species_date > '2024-12-31' THEN 'Future Date'
                 WHEN a.species_date != m.metadata_date THEN 'Date Mismatch'
                 ELSE 'Match'
-            END
-        ) as category_count
-    FROM additional_species a
-    LEFT JOIN metadata m ON a.survey_ID = m.survey_ID
-    LEFT JOIN point_intercept p ON a.survey_ID = p.survey_ID
-    LEFT JOIN ground_cover g ON a.survey_ID = g.survey_ID
-    ORDER BY 
-        CASE 
-            WHEN a.species_date > '2024-12-31' THEN 1
-            WHEN a.species_date != m.metadata_date THEN 2
+            END as status
+        FROM additional_species a
+        LEFT JOIN metadata m ON a.survey_ID = m.survey_ID
+        LEFT JOIN point_intercept p ON a.survey_ID = p.survey_ID
+        LEFT JOIN ground_cover g ON a.survey_ID = g.survey_ID
+    )
+    SELECT
+        status,
+        COUNT(*) as category_count,
+        ARRAY_AGG(
+            STRUCT(
+                survey_ID,
+                species_date,
+                metadata_date,
+                intercept_date,
+                ground_date
+            )
+            ORDER BY species_date
+            LIMIT 5
+        ) as samples
+    FROM classified
+    GROUP BY status
+    ORDER BY
+        CASE status
+            WHEN 'Future Date' THEN 1
+            WHEN 'Date Mismatch' THEN 2
             ELSE 3
-        END,
-        a.species_date
+        END
     """
-    
-    return client.query(query).to_dataframe()
+
+    # Key the cache on the query text and the last-modified time of every source table
+    key_parts = [query] + [
+        client.get_table(table_id).modified.isoformat() for table_id in SOURCE_TABLES
+    ]
+    cache_key = hashlib.sha256("\n".join(key_parts).encode()).hexdigest()[:16]
+    cache_file = os.path.join(CACHE_DIR, f"compare_dates_{cache_key}.parquet")
+
+    if os.path.exists(cache_file):
+        logging.info(f"Loading cached comparison results from {cache_file}")
+        return pd.read_parquet(cache_file, engine="pyarrow")
+
+    # Download via the BigQuery Storage API (Arrow over gRPC) rather than REST
+    df = client.query(query).to_dataframe(create_bqstorage_client=True)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    df.to_parquet(cache_file, engine="pyarrow", index=False)
+    logging.info(f"Cached comparison results to {cache_file}")
+
+    return df
 
 def analyze_results(df):
     """Analyze and display the comparison results"""
-    # Overall statistics
-    total_records = len(df)
-    future_dates = df[df['status'] == 'Future Date']
-    mismatches = df[df['status'] == 'Date Mismatch']
-    matches = df[df['status'] == 'Match']
+    # Overall statistics from the per-status aggregates
+    counts = dict(zip(df['status'], df['category_count']))
+    samples = dict(zip(df['status'], df['samples']))
+    total_records = sum(counts.values())
+    future_count = counts.get('Future Date', 0)
+    mismatch_count = counts.get('Date Mismatch', 0)
+    match_count = counts.get('Match', 0)
     
     print("\n=== Date Comparison Analysis ===")
     print(f"\nTotal Records Analyzed: {total_records:,}")
-    print(f"Records with Future Dates: {len(future_dates):,} ({len(future_dates)/total_records*100:.1f}%)")
-    print(f"Records with Date Mismatches: {len(mismatches):,} ({len(mismatches)/total_records*100:.1f}%)")
-    print(f"Records with Matching Dates: {len(matches):,} ({len(matches)/total_records*100:.1f}%)")
+    print(f"Records with Future Dates: {future_count:,} ({future_count/total_records*100:.1f}%)")
+    print(f"Records with Date Mismatches: {mismatch_count:,} ({mismatch_count/total_records*100:.1f}%)")
+    print(f"Records with Matching Dates: {match_count:,} ({match_count/total_records*100:.1f}%)")
     
-    if not future_dates.empty:
+    if future_count:
         print("\n=== Sample of Future Dates ===")
-        sample = future_dates.head()
-        for _, row in sample.iterrows():
-            print(f"\nSurvey ID: {row['survey_ID']}")
-            print(f"  Additional Species Date: {row['species_date']}")
-            print(f"  Metadata Date: {row['metadata_date']}")
-            print(f"  Point Intercept Date: {row['intercept_date']}")
-            print(f"  Ground Cover Date: {row['ground_date']}")
+        sample = pd.DataFrame(list(samples['Future Date']), columns=SAMPLE_COLUMNS)
+        print(sample.to_string(index=False))
     
-    if not mismatches.empty:
+    if mismatch_count:
         print("\n=== Sample of Date Mismatches ===")
-        sample = mismatches.head()
-        for _, row in sample.iterrows():
-            print(f"\nSurvey ID: {row['survey_ID']}")
-            print(f"  Additional Species Date: {row['species_date']}")
-            print(f"  Metadata Date: {row['metadata_date']}")
-            print(f"  Point Intercept Date: {row['intercept_date']}")
-            print(f"  Ground Cover Date: {row['ground_date']}")
+        sample = pd.DataFrame(list(samples['Date Mismatch']), columns=SAMPLE_COLUMNS)
+        print(sample.to_string(index=False))
 
 def main():
     client = connect_to_bigquery()
@@ -0,0 +1,224 @@
+from google.cloud import bigquery
+import argparse
+from datetime import datetime
+import functools
+import json
+
+
+SPECIES_TABLE = "mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_additional_species"
+METADATA_TABLE = "mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_survey_metadata"
+
+# The tables the date investigations join on survey_ID
+TABLE_IDS = [SPECIES_TABLE, METADATA_TABLE]
+CLUSTERING_FIELDS = ["survey_ID"]
+
+
+@functools.cache
+def connect_to_bigquery():
+    """Create a BigQuery client, reused for the rest of the process"""
+    return bigquery.Client()
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Cluster the gridVeg join tables by survey_ID"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show the current and new clustering without changing it",
+    )
+    parser.add_argument(
+        "--partition-species",
+        action="store_true",
+        help="Also rewrite gridVeg_additional_species partitioned by month of date",
+    )
+    parser.add_argument(
+        "--backup-bucket",
+        help=(
+            "GCS bucket for a backup of gridVeg_additional_species, required "
+            "before --partition-species rewrites it (format: bucket-name)"
+        ),
+    )
+    args = parser.parse_args()
+    if args.partition_species and not args.dry_run and not args.backup_bucket:
+        parser.error("--partition-species requires --backup-bucket")
+    return args
+
+
+def backup_table(table_id, backup_bucket):
+    """Backup BigQuery table to Cloud Storage."""
+    client = connect_to_bigquery()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    table_name = table_id.split(".")[-1]
+    backup_path = f"gs://{backup_bucket}/backups/{table_name}/{timestamp}/backup_*.csv"
+
+    job_config = bigquery.ExtractJobConfig()
+    job_config.destination_format = bigquery.DestinationFormat.CSV
+
+    try:
+        extract_job = client.extract_table(table_id, backup_path, job_config=job_config)
+        extract_job.result()
+
+        print(f"\nBackup created successfully: {backup_path}")
+        return True
+    except Exception as e:
+        print(f"Error creating backup: {e}")
+        return False
+
+
+def cluster_table(table_id, dry_run=True):
+    """Set the table's clustering spec to CLUSTERING_FIELDS.
+
+    The new spec applies to data written after the change (rewrite the table
+    to cluster existing rows), so joins on survey_ID read co-located blocks
+    instead of shuffling both sides.
+    """
+    client = connect_to_bigquery()
+    table = client.get_table(table_id)
+
+    if table.clustering_fields == CLUSTERING_FIELDS:
+        print(f"{table_id}: already clustered by {CLUSTERING_FIELDS}")
+        return
+
+    print(f"{table_id}: clustering {table.clustering_fields} -> {CLUSTERING_FIELDS}")
+    if dry_run:
+        return
+
+    table.clustering_fields = CLUSTERING_FIELDS
+    client.update_table(table, ["clustering_fields"])
+
+
+def table_options(table):
+    """OPTIONS(...) clause carrying over the table's description and labels,
+    which CREATE TABLE AS SELECT would otherwise drop"""
+    options = []
+    if table.description:
+        # A JSON string is also a valid BigQuery string literal
+        options.append(f"description={json.dumps(table.description)}")
+    if table.labels:
+        labels = ", ".join(
+            f"({json.dumps(key)}, {json.dumps(value)})"
+            for key, value in table.labels.items()
+        )
+        options.append(f"labels=[{labels}]")
+    return f"OPTIONS({', '.join(options)})" if options else ""
+
+
+def copy_column_descriptions(client, source, table_id):
+    """Give table_id's columns the descriptions they have in source."""
+    descriptions = {field.name: field.description for field in source.schema}
+    table = client.get_table(table_id)
+    table.schema = [
+        (
+            bigquery.SchemaField.from_api_repr(
+                {**field.to_api_repr(), "description": descriptions[field.name]}
+            )
+            if descriptions.get(field.name)
+            else field
+        )
+        for field in table.schema
+    ]
+    client.update_table(table, ["schema"])
+
+
+def partition_species_table(backup_bucket=None, dry_run=True):
+    """Rewrite SPECIES_TABLE partitioned by month of date and clustered by
+    CLUSTERING_FIELDS.
+
+    Partitioning can't be added to an existing table, and BigQuery refuses to
+    CREATE OR REPLACE a table with a different partitioning spec. So a
+    partitioned copy is built next to it, and the original is dropped and the
+    copy renamed in its place. Rebuilding also clusters the rows already
+    stored. Date filters such as date > '2024-12-31' then only read the
+    matching months.
+
+    The steps are not one transaction: no update script may load into
+    SPECIES_TABLE while this runs, or it recreates the table between the drop
+    and the rename.
+    """
+    client = connect_to_bigquery()
+    table = client.get_table(SPECIES_TABLE)
+
+    if table.time_partitioning is not None:
+        print(f"{SPECIES_TABLE}: already partitioned by {table.time_partitioning.field}")
+        return
+
+    print(f"{SPECIES_TABLE}: partitioning by month of date")
+    if dry_run:
+        return
+
+    if not backup_table(SPECIES_TABLE, backup_bucket):
+        print("Backup failed. Aborting partitioning.")
+        return
+
+    table_name = SPECIES_TABLE.split(".")[-1]
+    partitioned_table = f"{SPECIES_TABLE}_partitioned"
+    policy = client.get_iam_policy(SPECIES_TABLE)
+
+    try:
+        client.query_and_wait(
+            f"""
+            CREATE TABLE `{partitioned_table}`
+            PARTITION BY DATE_TRUNC(date, MONTH)
+            CLUSTER BY {", ".join(CLUSTERING_FIELDS)}
+            {table_options(table)}
+            AS
+            SELECT * FROM `{SPECIES_TABLE}`
+            """
+        )
+        copy_column_descriptions(client, table, partitioned_table)
+    except Exception as e:
+        print(f"Error building {partitioned_table}: {e}")
+        print(f"{SPECIES_TABLE} is unchanged; drop {partitioned_table} if it exists.")
+        return
+
+    try:
+        client.query_and_wait(f"DROP TABLE `{SPECIES_TABLE}`")
+    except Exception as e:
+        print(f"Error dropping {SPECIES_TABLE}: {e}")
+        print(f"{SPECIES_TABLE} is unchanged; drop {partitioned_table} and retry.")
+        return
+
+    try:
+        client.query_and_wait(
+            f"ALTER TABLE `{partitioned_table}` RENAME TO `{table_name}`"
+        )
+    except Exception as e:
+        print(f"Error renaming {partitioned_table}: {e}")
+        print(
+            f"{SPECIES_TABLE} has been dropped and its data is in "
+            f"{partitioned_table}. Stop any update loading into {table_name}, "
+            f"drop {SPECIES_TABLE} if a load recreated it (after saving the rows "
+            "it added), then run:\n"
+            f"  ALTER TABLE `{partitioned_table}` RENAME TO `{table_name}`"
+        )
+        return
+
+    # Table-level access isn't copied by CREATE TABLE AS SELECT either
+    if policy.bindings:
+        try:
+            new_policy = client.get_iam_policy(SPECIES_TABLE)
+            new_policy.bindings = policy.bindings
+            client.set_iam_policy(SPECIES_TABLE, new_policy)
+        except Exception as e:
+            print(f"Error restoring the IAM policy of {SPECIES_TABLE}: {e}")
+            print(f"Reapply these bindings by hand: {policy.bindings}")
+
+    print(f"{SPECIES_TABLE}: partitioned by month of date")
+
+
+def main():
+    args = parse_args()
+
+    if args.partition_species:
+        partition_species_table(args.backup_bucket, dry_run=args.dry_run)
+
+    for table_id in TABLE_IDS:
+        cluster_table(table_id, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
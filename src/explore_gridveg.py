@@ -1,119 +1,225 @@
 from google.cloud import bigquery
+from google.cloud import bigquery_storage
 import pandas as pd
+import matplotlib
+
+# Non-interactive backend: the plots are only ever written to PNG files
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
-import seaborn as sns
+import numpy as np
 from datetime import datetime
+import argparse
+import functools
 import os
 
 
+TABLE_ID = "mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_additional_species_copy"
+
+
+@functools.cache
+def connect_to_bigquery():
+    """Create a BigQuery client, reused for the rest of the process"""
+    return bigquery.Client()
+
+
 def load_or_query_data():
-    """Load data from interim CSV if it exists, otherwise query BigQuery"""
+    """Load data from interim Parquet if it exists, otherwise query BigQuery"""
     interim_dir = "data/interim"
-    interim_file = os.path.join(interim_dir, "gridveg_data.csv")
+    interim_file = os.path.join(interim_dir, "gridveg_data.parquet")
 
-    # Check if interim file exists
+    # Check if interim file exists (dtypes, including date, round-trip as-is)
     if os.path.exists(interim_file):
         print(f"Loading data from {interim_file}...")
-        return pd.read_csv(interim_file, parse_dates=["date"])
+        return pd.read_parquet(interim_file, engine="pyarrow")
 
     # If file doesn't exist, query BigQuery
     print("Querying BigQuery...")
-    client = bigquery.Client()
-    table_id = "mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_additional_species_copy"
+    client = connect_to_bigquery()
 
     query = f"""
     SELECT *
-    FROM `{table_id}`
+    FROM `{TABLE_ID}`
     """
 
-    df = client.query(query).to_dataframe()
+    # Stream the rows as Arrow record batches over the BigQuery Storage API,
+    # then convert once (dates arrive as datetime64, no parsing needed)
+    bqstorage_client = bigquery_storage.BigQueryReadClient()
+    arrow_table = (
+        client.query(query).result().to_arrow(bqstorage_client=bqstorage_client)
+    )
+    df = arrow_table.to_pandas(date_as_object=False)
 
     # Save to interim directory
     os.makedirs(interim_dir, exist_ok=True)
-    df.to_csv(interim_file, index=False)
+    df.to_parquet(interim_file, engine="pyarrow", compression="zstd", index=False)
     print(f"Data saved to {interim_file}")
 
     return df
 
 
-def explore_gridveg_table():
+def query_temporal_aggregates():
+    """Query observation counts per (year, month), aggregated in BigQuery"""
+    print("Querying BigQuery for temporal aggregates...")
+    client = connect_to_bigquery()
+
+    query = f"""
+    SELECT
+        EXTRACT(YEAR FROM date) year,
+        EXTRACT(MONTH FROM date) month,
+        COUNT(*) count,
+        MIN(date) first_date,
+        MAX(date) last_date
+    FROM `{TABLE_ID}`
+    WHERE date IS NOT NULL
+    GROUP BY year, month
+    ORDER BY year, month
+    """
+
+    return client.query(query).to_dataframe()
+
+
+def monthly_year_stats(counts):
+    """Box statistics of the year distribution within each month, computed
+    from (year, month, count) rows; whiskers span the 5th-95th percentiles"""
+    stats = []
+    for month, group in counts.sort_values("year").groupby("month"):
+        years = group["year"].to_numpy()
+        cumulative = group["count"].cumsum().to_numpy()
+
+        def quantile(q):
+            return years[np.searchsorted(cumulative, q * cumulative[-1])]
+
+        stats.append(
+            {
+                "label": month,
+                "whislo": quantile(0.05),
+                "q1": quantile(0.25),
+                "med": quantile(0.5),
+                "q3": quantile(0.75),
+                "whishi": quantile(0.95),
+            }
+        )
+    return stats
+
+
+def explore_gridveg_table(full=False, verbose=False):
     # Create visualization directory if it doesn't exist
     viz_dir = "visualizations"
     os.makedirs(viz_dir, exist_ok=True)
 
-    # Get data
-    df = load_or_query_data()
+    date_col = "date"
+    df = None
 
-    # Basic data info
-    print("\nDataset Info:")
-    print(df.info())
+    if full:
+        # Get every row and aggregate locally
+        df = load_or_query_data()
 
-    # Analyze the 'date' column
-    date_col = "date"
-    if date_col in df.columns:
-        print("\nTemporal Analysis:")
-        print(f"\nAnalyzing {date_col}:")
+        # Basic data info (a full per-column scan, so only when asked for)
+        if verbose:
+            print("\nDataset Info:")
+            df.info()
+
+        if date_col not in df.columns:
+            print(f"Warning: '{date_col}' column not found in the dataset")
+            return df
 
         # Convert dbdate to datetime
         df[date_col] = pd.to_datetime(df[date_col])
 
-        # Basic date statistics
-        print("\nDate range:")
-        print(f"Earliest date: {df[date_col].min()}")
-        print(f"Latest date: {df[date_col].max()}")
-
-        # Create temporal visualizations
-        fig = plt.figure(figsize=(12, 6))
-
-        # Count by year
-        df[f"{date_col}_year"] = df[date_col].dt.year
-        yearly_counts = df[f"{date_col}_year"].value_counts().sort_index()
-
-        plt.subplot(1, 2, 1)
-        yearly_counts.plot(kind="bar")
-        plt.title(f"Observations by Year\n({date_col})")
-        plt.xlabel("Year")
-        plt.ylabel("Count")
-        plt.xticks(rotation=45)
-
-        # Count by month (across all years)
-        df[f"{date_col}_month"] = df[date_col].dt.month
-        monthly_counts = df[f"{date_col}_month"].value_counts().sort_index()
-
-        plt.subplot(1, 2, 2)
-        monthly_counts.plot(kind="bar")
-        plt.title(f"Observations by Month\n({date_col})")
-        plt.xlabel("Month")
-        plt.ylabel("Count")
-        plt.xticks(rotation=45)
-
-        plt.tight_layout()
-
-        # Save the figure
-        viz_filename = os.path.join(viz_dir, f"temporal_analysis_{date_col}.png")
-        plt.savefig(viz_filename, dpi=300, bbox_inches="tight")
-        plt.close()
-
-        print(f"Visualization saved to: {viz_filename}")
-
-        # Create additional monthly distribution plot using seaborn
-        plt.figure(figsize=(10, 6))
-        sns.boxplot(data=df, x=f"{date_col}_month", y=f"{date_col}_year")
-        plt.title(f"Year Distribution by Month\n({date_col})")
-        plt.xlabel("Month")
-        plt.ylabel("Year")
-
-        # Save the additional plot
-        viz_filename = os.path.join(viz_dir, f"monthly_distribution_{date_col}.png")
-        plt.savefig(viz_filename, dpi=300, bbox_inches="tight")
-        plt.close()
-
-        print(f"Monthly distribution visualization saved to: {viz_filename}")
+        # Derive year/month with datetime64 arithmetic on the raw array
+        months = df[date_col].dropna().to_numpy().astype("datetime64[M]")
+        counts = (
+            pd.DataFrame(
+                {
+                    "year": months.astype("datetime64[Y]").astype(int) + 1970,
+                    "month": months.astype(int) % 12 + 1,
+                }
+            )
+            .value_counts(sort=False)
+            .sort_index()
+            .reset_index(name="count")
+        )
+        earliest, latest = df[date_col].min(), df[date_col].max()
     else:
-        print(f"Warning: '{date_col}' column not found in the dataset")
-
-    return df
+        # Only the per-(year, month) counts are needed for the plots
+        counts = query_temporal_aggregates()
+        earliest, latest = counts["first_date"].min(), counts["last_date"].max()
+
+    print("\nTemporal Analysis:")
+    print(f"\nAnalyzing {date_col}:")
+
+    # Basic date statistics
+    print("\nDate range:")
+    print(f"Earliest date: {earliest}")
+    print(f"Latest date: {latest}")
+
+    # Create temporal visualizations
+    fig, (ax_year, ax_month) = plt.subplots(1, 2, figsize=(12, 6))
+
+    # Count by year
+    yearly_counts = counts.groupby("year")["count"].sum().sort_index()
+
+    ax_year.bar(yearly_counts.index.astype(str), yearly_counts.to_numpy())
+    ax_year.set_title(f"Observations by Year\n({date_col})")
+    ax_year.set_xlabel("Year")
+    ax_year.set_ylabel("Count")
+    ax_year.tick_params(axis="x", labelrotation=45)
+
+    # Count by month (across all years)
+    monthly_counts = counts.groupby("month")["count"].sum().sort_index()
+
+    ax_month.bar(monthly_counts.index.astype(str), monthly_counts.to_numpy())
+    ax_month.set_title(f"Observations by Month\n({date_col})")
+    ax_month.set_xlabel("Month")
+    ax_month.set_ylabel("Count")
+    ax_month.tick_params(axis="x", labelrotation=45)
+
+    fig.tight_layout()
+
+    # Save the figure
+    viz_filename = os.path.join(viz_dir, f"temporal_analysis_{date_col}.png")
+    fig.savefig(viz_filename, dpi=300, bbox_inches="tight")
+    plt.close(fig)
+
+    print(f"Visualization saved to: {viz_filename}")
+
+    # Create additional monthly distribution plot from the counts directly,
+    # without materializing one value per observation
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.bxp(monthly_year_stats(counts), showfliers=False)
+    ax.set_title(f"Year Distribution by Month\n({date_col})")
+    ax.set_xlabel("Month")
+    ax.set_ylabel("Year")
+
+    # Save the additional plot
+    viz_filename = os.path.join(viz_dir, f"monthly_distribution_{date_col}.png")
+    fig.savefig(viz_filename, dpi=300, bbox_inches="tight")
+    plt.close(fig)
+
+    print(f"Monthly distribution visualization saved to: {viz_filename}")
+
+    return df if full else counts
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Explore the temporal distribution of gridVeg additional species"
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Download every row (cached in data/interim) instead of only "
+        "per-month counts aggregated in BigQuery",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print column dtypes and non-null counts of the full download",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    df = explore_gridveg_table()
+    args = parse_args()
+    df = explore_gridveg_table(full=args.full, verbose=args.verbose)
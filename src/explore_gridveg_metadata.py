@@ -1,44 +1,108 @@
 from google.cloud import bigquery
+from google.cloud import bigquery_storage
 import pandas as pd
+import numpy as np
+import matplotlib
+
+# Non-interactive backend: the plots are only ever written to PNG files
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
+import argparse
+import functools
 import os
 
 
+TABLE_ID = (
+    "mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_survey_metadata"
+)
+
+# Categorical columns counted in BigQuery by default. survey_ID is unique per
+# survey, so its counts are only printed for a full download
+CATEGORICAL_COLUMNS = ["survey_sequence", "surveyor"]
+
+
+@functools.cache
+def connect_to_bigquery():
+    """Create a BigQuery client, reused for the rest of the process"""
+    return bigquery.Client()
+
+
 def load_or_query_metadata():
-    """Load metadata from interim CSV if it exists, otherwise query BigQuery"""
+    """Load metadata from interim Parquet if it exists, otherwise query BigQuery"""
+    client = connect_to_bigquery()
+
+    # The interim file is named after the table's last-modified time (one
+    # metadata request, no data scanned), so it is never reused once stale
+    modified = client.get_table(TABLE_ID).modified
     interim_dir = "data/interim"
-    interim_file = os.path.join(interim_dir, "gridveg_metadata.csv")
+    interim_file = os.path.join(
+        interim_dir, f"gridveg_metadata_{modified.strftime('%Y%m%d%H%M%S')}.parquet"
+    )
 
-    # Check if interim file exists
+    # Check if interim file exists (dtypes, including date, round-trip as-is)
     if os.path.exists(interim_file):
         print(f"Loading metadata from {interim_file}...")
-        return pd.read_csv(interim_file, parse_dates=["date"])
+        return pd.read_parquet(interim_file, engine="pyarrow")
 
     # If file doesn't exist, query BigQuery
     print("Querying BigQuery...")
-    client = bigquery.Client()
-    table_id = (
-        "mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_survey_metadata"
-    )
 
-    query = f"""
-    SELECT *
-    FROM `{table_id}`
-    """
-
-    df = client.query(query).to_dataframe()
+    # Read the whole table directly, without a query job, streaming it as
+    # Arrow record batches over the BigQuery Storage API (dates arrive as
+    # datetime64, no parsing needed)
+    bqstorage_client = bigquery_storage.BigQueryReadClient()
+    arrow_table = client.list_rows(TABLE_ID).to_arrow(bqstorage_client=bqstorage_client)
+    df = arrow_table.to_pandas(date_as_object=False)
 
     # Save to interim directory
     os.makedirs(interim_dir, exist_ok=True)
-    df.to_csv(interim_file, index=False)
+    df.to_parquet(interim_file, engine="pyarrow", compression="snappy", index=False)
     print(f"Data saved to {interim_file}")
 
     return df
 
 
-def explore_metadata():
+def query_aggregates():
+    """Query per-value counts of CATEGORICAL_COLUMNS and survey counts per
+    (year, month), aggregated in BigQuery"""
+    print("Querying BigQuery for metadata aggregates...")
+    client = connect_to_bigquery()
+
+    # Submit every query before waiting on any, so BigQuery runs them together
+    count_jobs = {
+        col: client.query(
+            f"""
+            SELECT {col}, COUNT(*) count
+            FROM `{TABLE_ID}`
+            WHERE {col} IS NOT NULL
+            GROUP BY {col}
+            """
+        )
+        for col in CATEGORICAL_COLUMNS
+    }
+    temporal_job = client.query(
+        f"""
+        SELECT
+            EXTRACT(YEAR FROM date) year,
+            EXTRACT(MONTH FROM date) month,
+            COUNT(*) count,
+            MIN(date) first_date,
+            MAX(date) last_date
+        FROM `{TABLE_ID}`
+        WHERE date IS NOT NULL
+        GROUP BY year, month
+        """
+    )
+
+    value_counts = {
+        col: job.to_dataframe().set_index(col)["count"]
+        for col, job in count_jobs.items()
+    }
+    return value_counts, temporal_job.to_dataframe()
+
+
+def explore_metadata(full=False, verbose=False):
     # Create visualization directory if it doesn't exist
     viz_dir = "visualizations"
     os.makedirs(viz_dir, exist_ok=True)
@@ -47,116 +111,181 @@ def explore_metadata():
     viz_dir_abs = os.path.abspath(viz_dir)
     print(f"\nSaving visualizations to: {viz_dir_abs}")
 
-    # Get data
-    df = load_or_query_metadata()
-
-    # Basic data info
-    print("\nDataset Info:")
-    print(df.info())
-    print("\nSample of data:")
-    print(df.head())
-
-    # Analyze categorical columns
-    categorical_columns = df.select_dtypes(include=["object"]).columns
-    for col in categorical_columns:
-        print(f"\nUnique values in {col}:")
-        value_counts = df[col].value_counts()
-        print(value_counts)
-
-        # Skip visualization for surveyor column
-        if col == "surveyor":
-            continue
-
-        # Create bar plot for categorical variables
-        plt.figure(figsize=(10, 6))
-
-        # Special handling for survey_sequence to order by year
-        if col == "survey_sequence":
-            # Extract year from survey_sequence (handling both formats: "2011-12" and "2019")
-            df["seq_year"] = df[col].str.split("-").str[0]
-            # Sort by year and sequence number
-            value_counts = df.groupby(col).size().reset_index()
-            value_counts["year"] = value_counts[col].str.split("-").str[0]
-            value_counts = value_counts.sort_values("year")[col].value_counts()
-
-        value_counts.plot(kind="bar")
-        plt.title(f"Distribution of {col}")
-        plt.xlabel(col)
-        plt.ylabel("Count")
-        plt.xticks(rotation=45)
-        plt.tight_layout()
+    df = None
+    yearly_counts = None
+
+    if full:
+        # Get every row and aggregate locally
+        df = load_or_query_metadata()
+
+        # Basic data info (dtypes and non-null counts only, so no per-value
+        # memory scan of the string columns)
+        if verbose:
+            print("\nDataset Info:")
+            df.info(memory_usage=False)
+        print("\nSample of data:")
+        print(df.head())
+
+        # Analyze categorical columns
+        categorical_columns = df.select_dtypes(include=["object"]).columns
+        # Unsorted counts; only survey_sequence is ordered, by year, for its plot
+        value_counts = {
+            col: df[col].value_counts(sort=False) for col in categorical_columns
+        }
+
+        # Analyze survey_date if it exists
+        if "date" in df.columns:
+            earliest, latest = df["date"].min(), df["date"].max()
+
+            # Count by year and month. Both span small integer ranges, so
+            # bincount tallies them in one pass without hashing or sorting
+            df["year"] = df["date"].dt.year
+            years = df["year"].dropna().to_numpy(dtype="int64")
+            yearly_counts = pd.Series(
+                np.bincount(years - years.min()),
+                index=pd.RangeIndex(years.min(), years.max() + 1),
+            )
+
+            df["month"] = df["date"].dt.month
+            months = df["month"].dropna().to_numpy(dtype="int64")
+            monthly_counts = pd.Series(
+                np.bincount(months, minlength=13)[1:], index=pd.RangeIndex(1, 13)
+            )
+    else:
+        # Only the counts are needed for the summaries and plots
+        value_counts, temporal = query_aggregates()
+        earliest, latest = temporal["first_date"].min(), temporal["last_date"].max()
+
+        # Reindexing orders the (year or month) totals, so groupby needn't sort
+        years = temporal.groupby("year", sort=False)["count"].sum()
+        yearly_counts = years.reindex(
+            pd.RangeIndex(years.index.min(), years.index.max() + 1), fill_value=0
+        )
+        monthly_counts = (
+            temporal.groupby("month", sort=False)["count"]
+            .sum()
+            .reindex(pd.RangeIndex(1, 13), fill_value=0)
+        )
+
+    if verbose:
+        for col, counts in value_counts.items():
+            print(f"\nMost common values in {col}:")
+            print(counts.nlargest(20))
+
+    # Skip visualization for surveyor column
+    plot_columns = [col for col in value_counts if col != "surveyor"]
+
+    # One figure with a bar plot per categorical variable, rendered and saved
+    # once instead of once per column
+    if plot_columns:
+        fig, axes = plt.subplots(
+            len(plot_columns), 1, figsize=(10, 6 * len(plot_columns)), squeeze=False
+        )
+        for ax, col in zip(axes[:, 0], plot_columns):
+            counts = value_counts[col]
+
+            # Special handling for survey_sequence to order by year
+            if col == "survey_sequence":
+                # Extract year from survey_sequence (handling both formats: "2011-12" and "2019")
+                # The year is always the first four characters, so slice
+                # rather than split every label into a list
+                counts = counts.sort_index(
+                    key=lambda sequence: sequence.str.slice(0, 4)
+                )
+
+            counts.plot(kind="bar", ax=ax)
+            ax.set_title(f"Distribution of {col}")
+            ax.set_xlabel(col)
+            ax.set_ylabel("Count")
+            ax.tick_params(axis="x", labelrotation=45)
+        fig.tight_layout()
 
         # Save the figure
-        viz_filename = os.path.join(viz_dir, f"metadata_distribution_{col}.png")
-        plt.savefig(viz_filename, dpi=300, bbox_inches="tight")
-        plt.close()
+        viz_filename = os.path.join(viz_dir, "metadata_distributions.png")
+        fig.savefig(viz_filename, dpi=150, bbox_inches="tight")
+        plt.close(fig)
         print(f"Saved visualization: {os.path.abspath(viz_filename)}")
 
-    # Analyze survey_date if it exists
-    if "date" in df.columns:
+    if yearly_counts is not None:
         print("\nTemporal Analysis:")
 
         # Basic date statistics
         print("\nDate range:")
-        print(f"Earliest date: {df['date'].min()}")
-        print(f"Latest date: {df['date'].max()}")
+        print(f"Earliest date: {earliest}")
+        print(f"Latest date: {latest}")
 
         # Create temporal visualizations
-        fig = plt.figure(figsize=(12, 6))
-
-        # Count by year
-        df["year"] = df["date"].dt.year
-        yearly_counts = df["year"].value_counts().sort_index()
+        fig, (ax_year, ax_month) = plt.subplots(1, 2, figsize=(12, 6))
 
-        plt.subplot(1, 2, 1)
-        yearly_counts.plot(kind="bar")
-        plt.title("Surveys by Year")
-        plt.xlabel("Year")
-        plt.ylabel("Count")
-        plt.xticks(rotation=45)
+        yearly_counts.plot(kind="bar", ax=ax_year)
+        ax_year.set_title("Surveys by Year")
+        ax_year.set_xlabel("Year")
+        ax_year.set_ylabel("Count")
+        ax_year.tick_params(axis="x", labelrotation=45)
 
-        # Count by month
-        df["month"] = df["date"].dt.month
-        monthly_counts = df["month"].value_counts().sort_index()
+        monthly_counts.plot(kind="bar", ax=ax_month)
+        ax_month.set_title("Surveys by Month")
+        ax_month.set_xlabel("Month")
+        ax_month.set_ylabel("Count")
+        ax_month.tick_params(axis="x", labelrotation=45)
 
-        plt.subplot(1, 2, 2)
-        monthly_counts.plot(kind="bar")
-        plt.title("Surveys by Month")
-        plt.xlabel("Month")
-        plt.ylabel("Count")
-        plt.xticks(rotation=45)
-
-        plt.tight_layout()
+        fig.tight_layout()
 
         # Save the figure
-        viz_filename = os.path.join(viz_dir, f"metadata_temporal_analysis.png")
-        plt.savefig(viz_filename, dpi=300, bbox_inches="tight")
-        plt.close()
+        viz_filename = os.path.join(viz_dir, "metadata_temporal_analysis.png")
+        fig.savefig(viz_filename, dpi=150, bbox_inches="tight")
+        plt.close(fig)
         print(f"Saved visualization: {os.path.abspath(viz_filename)}")
 
-    # Analyze numeric columns
-    numeric_columns = df.select_dtypes(include=["int64", "float64"]).columns
+    # Analyze numeric columns (needs the individual rows)
+    numeric_columns = []
+    if full:
+        numeric_columns = df.select_dtypes(include=["int64", "float64"]).columns
     if len(numeric_columns) > 0:
         print("\nNumeric Column Statistics:")
         print(df[numeric_columns].describe())
 
-        # Create histograms for numeric variables
-        for col in numeric_columns:
-            plt.figure(figsize=(10, 6))
-            sns.histplot(data=df, x=col)
-            plt.title(f"Distribution of {col}")
-            plt.xlabel(col)
-            plt.ylabel("Count")
-            plt.tight_layout()
-
-            # Save the figure
-            viz_filename = os.path.join(viz_dir, f"metadata_histogram_{col}.png")
-            plt.savefig(viz_filename, dpi=300, bbox_inches="tight")
-            plt.close()
-            print(f"Saved visualization: {os.path.abspath(viz_filename)}")
+        # Create histograms for numeric variables, one figure for all of them
+        fig, axes = plt.subplots(
+            len(numeric_columns),
+            1,
+            figsize=(10, 6 * len(numeric_columns)),
+            squeeze=False,
+        )
+        for ax, col in zip(axes[:, 0], numeric_columns):
+            ax.hist(df[col].dropna(), bins="auto")
+            ax.set_title(f"Distribution of {col}")
+            ax.set_xlabel(col)
+            ax.set_ylabel("Count")
+        fig.tight_layout()
 
-    return df
+        # Save the figure
+        viz_filename = os.path.join(viz_dir, "metadata_histograms.png")
+        fig.savefig(viz_filename, dpi=150, bbox_inches="tight")
+        plt.close(fig)
+        print(f"Saved visualization: {os.path.abspath(viz_filename)}")
+
+    return df if full else value_counts
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Explore the gridVeg survey metadata")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Download every row (cached in data/interim) instead of only "
+        "counts aggregated in BigQuery; also plots the numeric columns",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print the dataset info and the 20 most common values of each "
+        "categorical column",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    df = explore_metadata()
+    args = parse_args()
+    df = explore_metadata(full=args.full, verbose=args.verbose)
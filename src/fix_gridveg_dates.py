@@ -1,12 +1,18 @@
 """Fix date transformation issues in gridVeg_additional_species table.
 
-The script first downloads data from BigQuery tables to CSV files, then processes them locally.
+The script first downloads data from BigQuery tables to Parquet files, then processes them locally.
 """
 
 from google.cloud import bigquery
+from google.cloud import bigquery_storage
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as pacsv
 from datetime import datetime
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import logging
 import sys
 import os
@@ -28,58 +34,131 @@ logging.basicConfig(
 )
 
 
+# Columns fix_dates reads from each table (None downloads every column)
+TABLE_COLUMNS = {
+    "gridVeg_survey_metadata": ["survey_ID", "date"],
+    "gridVeg_additional_species": None,
+}
+
+
+@functools.cache
 def connect_to_bigquery():
-    """Create a BigQuery client"""
+    """Create a BigQuery client, reused for the rest of the process"""
     return bigquery.Client()
 
 
-def download_table_to_csv(client, project_id, dataset_id, table_id):
-    """Download a BigQuery table to a CSV file
+@functools.cache
+def get_table(client, table_ref):
+    """Fetch a table's metadata once per process"""
+    return client.get_table(table_ref)
+
+
+@functools.cache
+def connect_to_bigquery_storage():
+    """Create a BigQuery Storage read client, reused for the rest of the process"""
+    return bigquery_storage.BigQueryReadClient()
+
+
+def cache_path(table, columns=None):
+    """Local Parquet path for a table download. The name includes the table's
+    last-modified time, so a cache is never reused after the table changes,
+    and projected downloads are named after their columns, so a narrower cache
+    is never reused for more columns"""
+    name = table.table_id
+    if columns is not None:
+        name = f"{name}__{'-'.join(columns)}"
+    return f"data/external/{name}.{table.modified.strftime('%Y%m%d%H%M%S')}.parquet"
+
+
+def download_table(client, project_id, dataset_id, table_id, columns=None, cache=True):
+    """Download a BigQuery table, saving a Parquet copy of it unless cache is False
 
     Args:
         client: BigQuery client
         project_id: GCP project ID
         dataset_id: BigQuery dataset ID
         table_id: BigQuery table ID
+        columns: Columns to download, or None for all of them
+        cache: Whether to save the download to its local Parquet file
 
     Returns:
-        str: Path to the saved CSV file
-    """
-    query = f"""
-    SELECT *
-    FROM `{project_id}.{dataset_id}.{table_id}`
+        pd.DataFrame: The downloaded data
     """
-
     logging.info(f"Downloading {table_id}...")
-    df = client.query(query).to_dataframe()
+    table = get_table(client, f"{project_id}.{dataset_id}.{table_id}")
+    selected_fields = None
+    if columns is not None:
+        selected_fields = [field for field in table.schema if field.name in columns]
+
+    # Read the table directly, without a query job, streaming only the selected
+    # columns as Arrow record batches over the BigQuery Storage API
+    arrow_table = client.list_rows(table, selected_fields=selected_fields).to_arrow(
+        bqstorage_client=connect_to_bigquery_storage()
+    )
+    # String columns (survey_ID above all) come back dictionary-encoded as
+    # categoricals, so the date join in fix_dates only hashes each distinct ID
+    # once; the Parquet cache keeps the encoding for later runs
+    df = arrow_table.to_pandas(date_as_object=False, strings_to_categorical=True)
 
-    output_path = f"data/external/{table_id}.csv"
-    df.to_csv(output_path, index=False)
-    logging.info(f"Saved to {output_path}")
+    # Parquet keeps the dtypes, so later runs load it without re-parsing
+    if cache:
+        output_path = cache_path(table, columns)
+        df.to_parquet(output_path, engine="pyarrow", compression="snappy", index=False)
+        logging.info(f"Saved to {output_path}")
 
-    return output_path
+    return df
 
 
-def load_or_download_data(client, project_id, dataset_id, table_id):
-    """Load data from CSV if it exists, otherwise download from BigQuery
+def load_or_download_data(
+    client, project_id, dataset_id, table_id, columns=None, cache=True
+):
+    """Load data from Parquet if it exists, otherwise download from BigQuery
 
     Args:
         client: BigQuery client
         project_id: GCP project ID
         dataset_id: BigQuery dataset ID
         table_id: BigQuery table ID
+        columns: Columns to load, or None for all of them
+        cache: Whether to use the local Parquet file; if False the table is
+            always downloaded and not saved
 
     Returns:
         pd.DataFrame: The loaded data
     """
-    csv_path = f"data/external/{table_id}.csv"
+    if cache:
+        # The cache file is named after the table's last-modified time, which
+        # takes one metadata request and scans no data
+        table = get_table(client, f"{project_id}.{dataset_id}.{table_id}")
+        parquet_path = cache_path(table, columns)
+
+        if os.path.exists(parquet_path):
+            logging.info(f"Loading existing Parquet file: {parquet_path}")
+            return pd.read_parquet(parquet_path, engine="pyarrow")
+
+        logging.info(f"Parquet file not found. Downloading {table_id} from BigQuery...")
 
-    if os.path.exists(csv_path):
-        logging.info(f"Loading existing CSV file: {csv_path}")
-        return pd.read_csv(csv_path)
+    return download_table(client, project_id, dataset_id, table_id, columns, cache)
 
-    logging.info(f"CSV not found. Downloading {table_id} from BigQuery...")
-    return download_table_to_csv(client, project_id, dataset_id, table_id)
+
+def parse_dates(dates):
+    """Return a date Series as datetime64, parsing it only if it isn't already"""
+    # The Parquet copies keep DATE columns as datetime64, so this is usually a
+    # dtype check; text dates are ISO formatted, which skips format inference
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    return pd.to_datetime(dates, format="%Y-%m-%d", cache=True)
+
+
+def check_unique_survey_ids(metadata_df):
+    """Raise ValueError if a survey_ID appears more than once in the metadata,
+    since its species rows could then be given either date"""
+    duplicated = metadata_df["survey_ID"].duplicated(keep=False)
+    if duplicated.any():
+        raise ValueError(
+            "gridVeg_survey_metadata has more than one row for survey_IDs: "
+            + ", ".join(map(str, metadata_df["survey_ID"][duplicated].unique()[:5]))
+        )
 
 
 def fix_dates(metadata_df, species_df):
@@ -92,53 +171,201 @@ def fix_dates(metadata_df, species_df):
     Returns:
         pd.DataFrame: Species data with corrected dates
     """
-    # Create a copy to avoid modifying original data
-    fixed_df = species_df.copy()
-
     # Convert date columns to datetime if they aren't already
-    metadata_df["date"] = pd.to_datetime(metadata_df["date"])
-    fixed_df["date"] = pd.to_datetime(fixed_df["date"])
+    species_dates = parse_dates(species_df["date"])
 
-    # Before the merge, log some statistics
-    logging.info(f"\nBefore date correction:")
+    # Before the merge, log some statistics (one record per block)
     logging.info(
-        f"Date range in species data: {fixed_df['date'].min()} to {fixed_df['date'].max()}"
+        "\nBefore date correction:\nDate range in species data: %s to %s\n"
+        "Number of records: %d",
+        species_dates.min(),
+        species_dates.max(),
+        len(species_df),
     )
-    logging.info(f"Number of records: {len(fixed_df)}")
 
     # Create a mapping of survey_ID to correct date
-    date_mapping = metadata_df[["survey_ID", "date"]].set_index("survey_ID")
+    check_unique_survey_ids(metadata_df)
+    date_mapping = pd.Series(
+        parse_dates(metadata_df["date"]).to_numpy(), index=metadata_df["survey_ID"]
+    )
+
+    # A shallow copy shares the species columns instead of duplicating the
+    # frame; date and year are replaced as whole columns below, which leaves
+    # species_df untouched
+    fixed_df = species_df.copy(deep=False)
 
-    # Replace the dates using the mapping
-    fixed_df["date"] = fixed_df["survey_ID"].map(date_mapping["date"])
+    # Replace the dates with a single hash join against the mapping; survey_IDs
+    # missing from the metadata come back as NaT. With categorical survey_IDs
+    # only the categories are looked up and the codes are reused per row
+    fixed_df["date"] = date_mapping.reindex(fixed_df["survey_ID"]).to_numpy()
 
-    # Update the year column to integer based on the date
-    fixed_df["year"] = fixed_df["date"].dt.year.astype("int32")
+    # Update the year column to integer based on the date. dt.year already
+    # extracts int32 fields in one pass; years fit in int16, halving the column
+    fixed_df["year"] = fixed_df["date"].dt.year.astype("int16")
 
     # After the merge, log the results
-    logging.info(f"\nAfter date correction:")
     logging.info(
-        f"Date range in species data: {fixed_df['date'].min()} to {fixed_df['date'].max()}"
+        "\nAfter date correction:\nDate range in species data: %s to %s\n"
+        "Number of records: %d\nYear dtype: %s",
+        fixed_df["date"].min(),
+        fixed_df["date"].max(),
+        len(fixed_df),
+        fixed_df["year"].dtype,
     )
-    logging.info(f"Number of records: {len(fixed_df)}")
-    logging.info(f"Year dtype: {fixed_df['year'].dtype}")
 
     # Check for any missing dates after the merge
     missing_dates = fixed_df[fixed_df["date"].isna()]
     if len(missing_dates) > 0:
-        logging.warning(f"Found {len(missing_dates)} records with missing dates!")
-        logging.warning("Sample of survey_IDs with missing dates:")
-        logging.warning(missing_dates["survey_ID"].head())
+        logging.warning(
+            "Found %d records with missing dates!\n"
+            "Sample of survey_IDs with missing dates:\n%s",
+            len(missing_dates),
+            missing_dates["survey_ID"].head().to_string(index=False),
+        )
 
     return fixed_df
 
 
+def fix_dates_batch(batch, survey_ids, dates):
+    """Arrow version of fix_dates for one record batch of the species table
+
+    Args:
+        batch: pa.RecordBatch of species data (contains incorrect dates)
+        survey_ids: pa.Array of metadata survey_IDs
+        dates: pa.Array of the correct date for each of survey_ids
+
+    Returns:
+        pa.RecordBatch: The batch with corrected date and year columns
+    """
+    # Position of each row's survey_ID in the metadata; unknown IDs give null
+    # positions, which take() turns into null dates
+    fixed_dates = pc.take(dates, pc.index_in(batch["survey_ID"], value_set=survey_ids))
+    fixed_years = pc.cast(pc.year(fixed_dates), pa.int16())
+
+    columns = dict(zip(batch.schema.names, batch.columns))
+    columns["date"] = fixed_dates
+    columns["year"] = fixed_years
+    return pa.RecordBatch.from_arrays(list(columns.values()), names=list(columns))
+
+
+def stream_fixed_species(client, project_id, dataset_id, metadata_df, output_path):
+    """Download the species table batch by batch, fixing each batch's dates
+    and appending it to the output CSV, so only one batch is held in memory
+
+    Args:
+        client: BigQuery client
+        project_id: GCP project ID
+        dataset_id: BigQuery dataset ID
+        metadata_df: DataFrame with survey metadata (contains correct dates)
+        output_path: Path of the CSV file to write
+
+    Returns:
+        int: Number of rows written
+    """
+    # index_in would silently use the first of several matches
+    check_unique_survey_ids(metadata_df)
+    metadata = pa.Table.from_pandas(
+        metadata_df[["survey_ID", "date"]], preserve_index=False
+    )
+    survey_ids = metadata["survey_ID"].combine_chunks().cast(pa.string())
+    dates = metadata["date"].combine_chunks().cast(pa.date32())
+
+    table = client.get_table(f"{project_id}.{dataset_id}.gridVeg_additional_species")
+    batches = client.list_rows(table).to_arrow_iterable(
+        bqstorage_client=connect_to_bigquery_storage()
+    )
+
+    total_rows = 0
+    missing_dates = 0
+    writer = None
+    try:
+        for batch in batches:
+            fixed_batch = fix_dates_batch(batch, survey_ids, dates)
+            if writer is None:
+                writer = pacsv.CSVWriter(output_path, fixed_batch.schema)
+            writer.write_batch(fixed_batch)
+            total_rows += fixed_batch.num_rows
+            missing_dates += fixed_batch["date"].null_count
+    finally:
+        if writer is not None:
+            writer.close()
+
+    logging.info(f"Fixed dates in {total_rows} species records")
+    if missing_dates:
+        logging.warning(f"Found {missing_dates} records with missing dates!")
+
+    return total_rows
+
+
+def fix_dates_in_warehouse(client, project_id, dataset_id):
+    """Write the species table with corrected dates to
+    gridVeg_additional_species_fixed, joining against the metadata in BigQuery
+
+    Args:
+        client: BigQuery client
+        project_id: GCP project ID
+        dataset_id: BigQuery dataset ID
+
+    Returns:
+        str: ID of the fixed table
+    """
+    dataset = f"{project_id}.{dataset_id}"
+    fixed_table_id = f"{dataset}.gridVeg_additional_species_fixed"
+
+    # Same join as fix_dates, run where the data lives: nothing is downloaded.
+    # Like fix_dates, it refuses duplicate metadata survey_IDs, which the LEFT
+    # JOIN would otherwise turn into duplicated species rows
+    query = f"""
+    ASSERT (
+        SELECT COUNT(*) = COUNT(DISTINCT survey_ID)
+        FROM `{dataset}.gridVeg_survey_metadata`
+    ) AS 'gridVeg_survey_metadata has more than one row for some survey_IDs';
+
+    CREATE OR REPLACE TABLE `{fixed_table_id}` AS
+    SELECT
+        s.* REPLACE (m.date AS date, EXTRACT(YEAR FROM m.date) AS year)
+    FROM `{dataset}.gridVeg_additional_species` s
+    LEFT JOIN `{dataset}.gridVeg_survey_metadata` m
+    USING (survey_ID)
+    """
+
+    logging.info(f"Writing fixed species data to {fixed_table_id}...")
+    client.query_and_wait(query)
+
+    # Check for any missing dates after the join
+    rows = client.query_and_wait(
+        f"SELECT COUNTIF(date IS NULL) AS missing_dates FROM `{fixed_table_id}`"
+    )
+    missing_dates = next(iter(rows)).missing_dates
+    if missing_dates:
+        logging.warning(f"Found {missing_dates} records with missing dates!")
+
+    return fixed_table_id
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Download gridVeg tables from BigQuery"
     )
     parser.add_argument("--project-id", required=True, help="BigQuery project ID")
     parser.add_argument("--dataset-id", required=True, help="BigQuery dataset ID")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always download the tables, without reading or writing local copies",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Fix the species table batch by batch as it downloads, without "
+        "loading or caching it whole",
+    )
+    parser.add_argument(
+        "--in-warehouse",
+        action="store_true",
+        help="Write the fixed species data to gridVeg_additional_species_fixed "
+        "in BigQuery instead of downloading it to a CSV",
+    )
 
     args = parser.parse_args()
 
@@ -146,18 +373,53 @@ def main():
     os.makedirs("data/interim", exist_ok=True)
 
     client = connect_to_bigquery()
+    output_path = "data/interim/gridVeg_additional_species_fixed.csv"
 
     try:
-        # Load or download both tables
-        tables = ["gridVeg_survey_metadata", "gridVeg_additional_species"]
+        if args.in_warehouse:
+            fixed_table_id = fix_dates_in_warehouse(
+                client, args.project_id, args.dataset_id
+            )
+            logging.info(f"\nSaved fixed data to: {fixed_table_id}")
+            return
+
+        if args.stream:
+            # Only the small metadata table is loaded whole
+            metadata_df = load_or_download_data(
+                client,
+                args.project_id,
+                args.dataset_id,
+                "gridVeg_survey_metadata",
+                TABLE_COLUMNS["gridVeg_survey_metadata"],
+                not args.no_cache,
+            )
+            stream_fixed_species(
+                client, args.project_id, args.dataset_id, metadata_df, output_path
+            )
+            logging.info(f"\nSaved fixed data to: {output_path}")
+            return
+
+        # Load or download both tables concurrently; the downloads are
+        # independent and mostly waiting on the network
         dataframes = {}
 
-        for table_id in tables:
-            df = load_or_download_data(
-                client, args.project_id, args.dataset_id, table_id
-            )
-            dataframes[table_id] = df
-            logging.info(f"Loaded {table_id} with shape: {df.shape}")
+        with ThreadPoolExecutor(max_workers=len(TABLE_COLUMNS)) as executor:
+            futures = {
+                table_id: executor.submit(
+                    load_or_download_data,
+                    client,
+                    args.project_id,
+                    args.dataset_id,
+                    table_id,
+                    columns,
+                    not args.no_cache,
+                )
+                for table_id, columns in TABLE_COLUMNS.items()
+            }
+            for table_id, future in futures.items():
+                df = future.result()
+                dataframes[table_id] = df
+                logging.info(f"Loaded {table_id} with shape: {df.shape}")
 
         metadata_df = dataframes["gridVeg_survey_metadata"]
         species_df = dataframes["gridVeg_additional_species"]
@@ -165,9 +427,15 @@ def main():
         # Fix the dates
         fixed_species_df = fix_dates(metadata_df, species_df)
 
-        # Save to interim folder
-        output_path = "data/interim/gridVeg_additional_species_fixed.csv"
-        fixed_species_df.to_csv(output_path, index=False)
+        # Save to interim folder. Formatted by Arrow's multithreaded CSV writer;
+        # the dates are DATEs in BigQuery, so they are written without a time
+        table = pa.Table.from_pandas(fixed_species_df, preserve_index=False)
+        table = table.set_column(
+            table.schema.get_field_index("date"),
+            "date",
+            table["date"].cast(pa.date32()),
+        )
+        pacsv.write_csv(table, output_path)
         logging.info(f"\nSaved fixed data to: {output_path}")
 
     except Exception as e:
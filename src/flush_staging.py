@@ -0,0 +1,214 @@
+import fsspec
+from pathlib import Path
+from google.cloud import bigquery
+import argparse
+from datetime import datetime
+import functools
+import logging
+
+
+# Where the update scripts stage Parquet files and this script loads them from;
+# keyed on the full table ID so same-named tables in other datasets stay apart
+STAGING_LAYOUT = "{staging_dir}/{table_id}/{day}"
+
+
+@functools.cache
+def connect_to_bigquery():
+    """Create a BigQuery client, reused for the rest of the process"""
+    return bigquery.Client()
+
+
+def setup_logging(table_id):
+    """Setup logging for BigQuery updates."""
+    log_dir = Path(__file__).parents[2] / "logs"
+    log_dir.mkdir(exist_ok=True)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    table_name = table_id.split(".")[-1]
+    log_file = log_dir / f"bigquery_flush_{table_name}_{timestamp}.log"
+
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+
+    # Clear any existing handlers
+    logger.handlers = []
+
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    logger.addHandler(file_handler)
+    logger.addHandler(stream_handler)
+
+    return logger
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Load a day's staged Parquet files into BigQuery in one job"
+    )
+    parser.add_argument(
+        "--table-id",
+        required=True,
+        help="BigQuery table ID (format: project.dataset.table)",
+    )
+    parser.add_argument(
+        "--staging-dir",
+        required=True,
+        help="GCS staging area used by the update scripts (format: gs://bucket/prefix)",
+    )
+    parser.add_argument(
+        "--date",
+        default=datetime.now().strftime("%Y-%m-%d"),
+        help="Staging day to load (format: YYYY-MM-DD, default: today)",
+    )
+    parser.add_argument(
+        "--backup-bucket",
+        help="GCS bucket for table backup (format: bucket-name)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show what would be loaded without performing it",
+    )
+    return parser.parse_args()
+
+
+def staging_prefix(staging_dir, table_id, day):
+    """Staging directory for a table's files from one day (YYYY-MM-DD)."""
+    return STAGING_LAYOUT.format(
+        staging_dir=staging_dir.rstrip("/"),
+        table_id=table_id,
+        day=day,
+    )
+
+
+def stage_parquet(buffer, table_id, staging_dir):
+    """Write a Parquet buffer to the staging area for a later batched load."""
+    table_name = table_id.split(".")[-1]
+    now = datetime.now()
+    timestamp = now.strftime("%Y%m%d_%H%M%S_%f")
+    staged_path = (
+        f"{staging_prefix(staging_dir, table_id, now.strftime('%Y-%m-%d'))}/"
+        f"{table_name}_{timestamp}.parquet"
+    )
+
+    with fsspec.open(staged_path, "wb") as f:
+        f.write(buffer.getvalue())
+
+    print(f"\nStaged {staged_path}")
+    print(
+        f"Load it with: python src/flush_staging.py --table-id {table_id} "
+        f"--staging-dir {staging_dir}"
+    )
+    return staged_path
+
+
+def backup_table(table_id, backup_bucket):
+    """Backup BigQuery table to Cloud Storage."""
+    client = connect_to_bigquery()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    table_name = table_id.split(".")[-1]
+    backup_path = f"gs://{backup_bucket}/backups/{table_name}/{timestamp}/backup_*.csv"
+
+    job_config = bigquery.ExtractJobConfig()
+    job_config.destination_format = bigquery.DestinationFormat.CSV
+
+    try:
+        extract_job = client.extract_table(table_id, backup_path, job_config=job_config)
+        extract_job.result()
+
+        print(f"\nBackup created successfully: {backup_path}")
+        return True
+    except Exception as e:
+        print(f"Error creating backup: {e}")
+        return False
+
+
+def list_staged(prefix):
+    """Return the filesystem and the Parquet files staged directly in prefix."""
+    fs, path = fsspec.core.url_to_fs(prefix)
+    return fs, sorted(fs.glob(f"{path}/*.parquet"))
+
+
+def flush_staging(table_id, source_uris, logger):
+    """Append the staged Parquet files at source_uris in one load job."""
+    client = connect_to_bigquery()
+
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+    )
+
+    try:
+        logger.info(f"Starting load of {len(source_uris)} files to {table_id}")
+
+        job = client.load_table_from_uri(source_uris, table_id, job_config=job_config)
+        job.result()  # Wait for the job to complete
+
+        logger.info(f"Successfully loaded {job.output_rows} rows to BigQuery")
+        print(f"\nSuccessfully loaded {job.output_rows} rows to BigQuery")
+        return True
+    except Exception as e:
+        logger.error(f"Error loading to BigQuery: {e}")
+        print(f"Error loading to BigQuery: {e}")
+        return False
+
+
+def mark_loaded(fs, staged, logger):
+    """Move loaded files into a loaded/ sub-prefix, so a later flush of the
+    same day doesn't append them again."""
+    for path in staged:
+        directory, name = path.rsplit("/", 1)
+        try:
+            fs.makedirs(f"{directory}/loaded", exist_ok=True)
+            fs.mv(path, f"{directory}/loaded/{name}")
+        except Exception as e:
+            # The rows are already in BigQuery; the file must not be loaded again
+            logger.error(f"Error moving loaded file {path}: {e}")
+            print(
+                f"Error moving {path}: {e}\n"
+                f"It is already loaded; move it to {directory}/loaded/ by hand "
+                "before flushing this day again."
+            )
+
+
+def main():
+    # Parse command line arguments
+    args = parse_args()
+
+    prefix = staging_prefix(args.staging_dir, args.table_id, args.date)
+
+    # Only the files listed here are loaded and then moved, so files staged
+    # while the load runs wait for the next flush
+    fs, staged = list_staged(prefix)
+    if not staged:
+        print(f"\nNothing staged in {prefix}")
+        return
+    source_uris = [fs.unstrip_protocol(path) for path in staged]
+
+    if args.dry_run:
+        print(
+            f"\nDry run - would load {len(source_uris)} files from {prefix} "
+            f"into {args.table_id}"
+        )
+        return
+
+    logger = setup_logging(args.table_id)
+
+    if args.backup_bucket:
+        print(f"\nCreating table backup...")
+        if not backup_table(args.table_id, args.backup_bucket):
+            print("Backup failed. Aborting load.")
+            return
+
+    if flush_staging(args.table_id, source_uris, logger):
+        mark_loaded(fs, staged, logger)
+
+
+if __name__ == "__main__":
+    main()
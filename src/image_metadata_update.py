@@ -3,9 +3,16 @@ from pathlib import Path
 from google.cloud import bigquery
 import argparse
 from datetime import datetime
+import functools
 import logging
 
 
+@functools.cache
+def connect_to_bigquery():
+    """Create a BigQuery client, reused for the rest of the process"""
+    return bigquery.Client()
+
+
 def setup_logging(table_id):
     """Setup logging for BigQuery updates."""
     # Create logs directory if it doesn't exist
@@ -42,16 +49,27 @@ def load_data():
         Path(__file__).parents[2]
         / "data/external/2024-10-21_gridVeg_ref_image_metadata_SOURCE.csv"
     )
-    df = pd.read_csv(file_path)
+    # Parse with Arrow's multithreaded reader into Arrow-backed columns, typing
+    # the date and integer columns while parsing so transform_data has nothing
+    # left to convert
+    df = pd.read_csv(
+        file_path,
+        engine="pyarrow",
+        dtype_backend="pyarrow",
+        dtype={
+            "Survey Data::SurveyYear": "int32[pyarrow]",
+            "Survey Data::_kf_Site": "int32[pyarrow]",
+        },
+        parse_dates=["Survey Data::SurveyDate"],
+        date_format="%m/%d/%y",
+    )
     return df
 
 
 def transform_data(df):
     """Transform the data to match BigQuery schema."""
-    df_transformed = df.copy()
-
-    # Rename columns
-    df_transformed = df_transformed.rename(
+    # Rename columns (columns are reassigned below, never written in place)
+    df_transformed = df.rename(
         columns={
             "__kp_Photos": "image_ID",
             "Survey Data::__kp_Survey": "survey_ID",
@@ -59,7 +77,8 @@ def transform_data(df):
             "Survey Data::SurveyYear": "year",
             "Survey Data::_kf_Site": "grid_point",
             "Direction": "image_direction",
-        }
+        },
+        copy=False,
     )
 
     # Add image_url column (placeholder - you'll need to specify the actual URL pattern)
@@ -67,12 +86,17 @@ def transform_data(df):
         None  # Replace with actual URL construction if available
     )
 
-    # Convert date format
-    df_transformed["date"] = pd.to_datetime(df_transformed["date"])
+    # Convert date format (source export writes m/d/yy, repeated per survey;
+    # skipped when read_csv already parsed it)
+    if not pd.api.types.is_datetime64_any_dtype(df_transformed["date"]):
+        df_transformed["date"] = pd.to_datetime(
+            df_transformed["date"], format="%m/%d/%y", cache=True, errors="raise"
+        )
 
-    # Convert numeric fields
-    df_transformed["year"] = pd.to_numeric(df_transformed["year"])
-    df_transformed["grid_point"] = pd.to_numeric(df_transformed["grid_point"])
+    # Convert numeric fields (skipped when read_csv already typed them)
+    for col in ["year", "grid_point"]:
+        if not pd.api.types.is_numeric_dtype(df_transformed[col]):
+            df_transformed[col] = pd.to_numeric(df_transformed[col])
 
     # Reorder columns to match schema
     columns_order = [
@@ -95,37 +119,34 @@ def validate_data(df, logger):
     validation_output.append("\nValidating Image Metadata:")
     validation_output.append(f"Total records: {len(df)}")
 
-    # Check for null values
-    validation_output.append("\nNull values in key columns:")
-    null_counts = df.isnull().sum()
-    validation_output.append(str(null_counts))
-
-    # Check data types
-    validation_output.append("\nData types:")
-    validation_output.append(str(df.dtypes))
+    # Check null values and data types, reported together from one scan
+    validation_output.append("\nNull values and data types:")
+    summary = pd.DataFrame({"nulls": df.isnull().sum(), "dtype": df.dtypes})
+    null_counts = summary["nulls"]
+    validation_output.append(str(summary))
 
     # Log validation output
     for line in validation_output:
         logger.info(line)
 
-    # Validate required fields
-    required_valid = all(
-        [
-            df["image_ID"].notnull().all(),
-            df["survey_ID"].notnull().all(),
-            df["date"].notnull().all(),
-            df["year"].notnull().all(),
-            df["grid_point"].notnull().all(),
-            df["image_direction"].notnull().all(),
-        ]
-    )
+    # Validate required fields from the null counts computed above, rather
+    # than scanning each column again
+    required_columns = [
+        "image_ID",
+        "survey_ID",
+        "date",
+        "year",
+        "grid_point",
+        "image_direction",
+    ]
+    required_valid = bool((null_counts[required_columns] == 0).all())
 
     return required_valid
 
 
 def upload_to_bigquery(df, table_id, dry_run=True, logger=None):
     """Upload the transformed data to BigQuery."""
-    client = bigquery.Client()
+    client = connect_to_bigquery()
 
     # Define schema
     schema = [
@@ -169,15 +190,11 @@ def upload_to_bigquery(df, table_id, dry_run=True, logger=None):
                 logger.error(error_msg)
     else:
         try:
-            # Convert DataFrame to records
-            records = df.to_dict("records")
-
-            # Handle date conversion
-            for record in records:
-                if isinstance(record["date"], pd.Timestamp):
-                    record["date"] = record["date"].strftime("%Y-%m-%d")
-
-            job = client.load_table_from_json(records, table_id, job_config=job_config)
+            # Serialized to Parquet via Arrow against the schema, so the
+            # datetime column is written as DATE without per-row conversion
+            job = client.load_table_from_dataframe(
+                df, table_id, job_config=job_config
+            )
             job.result()
 
             logger.info(f"Successfully uploaded {len(df)} rows to BigQuery")
@@ -211,7 +228,7 @@ def parse_args():
 
 def backup_table(table_id, backup_bucket):
     """Backup BigQuery table to Cloud Storage."""
-    client = bigquery.Client()
+    client = connect_to_bigquery()
 
     # Create timestamp for backup file
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -1,17 +1,24 @@
 from google.cloud import bigquery
 import pandas as pd
+import numpy as np
+import matplotlib
+
+# Non-interactive backend: the plots are only ever written to PNG files
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 from datetime import datetime
+import functools
 
 
+@functools.cache
 def connect_to_bigquery():
-    """Create a BigQuery client"""
+    """Create a BigQuery client, reused for the rest of the process"""
     return bigquery.Client()
 
 
-def compare_dates_between_tables(client):
-    """Compare dates between additional_species and survey_metadata tables"""
-    query = """
+# Per (survey_ID, date) comparison of the two tables, shared by the row-level
+# download and the in-warehouse summary
+COMPARISON_QUERY = """
     WITH additional_species_dates AS (
         SELECT DISTINCT
             survey_ID,
@@ -30,108 +37,162 @@ def compare_dates_between_tables(client):
         FROM 
             `mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_survey_metadata`
         GROUP BY survey_ID, date
+    ),
+    compared AS (
+        SELECT
+            a.survey_ID,
+            a.species_date,
+            m.metadata_date,
+            a.species_record_count,
+            m.metadata_record_count,
+            a.sample_dates,
+            CASE 
+                WHEN m.survey_ID IS NULL THEN 'Missing in Metadata'
+                WHEN a.species_date != m.metadata_date THEN 'Date Mismatch'
+                ELSE 'Match'
+            END as status,
+            EXTRACT(YEAR FROM a.species_date) as species_year,
+            EXTRACT(MONTH FROM a.species_date) as species_month,
+            EXTRACT(DAY FROM a.species_date) as species_day,
+            EXTRACT(YEAR FROM m.metadata_date) as metadata_year,
+            EXTRACT(MONTH FROM m.metadata_date) as metadata_month,
+            EXTRACT(DAY FROM m.metadata_date) as metadata_day
+        FROM additional_species_dates a
+        LEFT JOIN metadata_dates m
+        ON a.survey_ID = m.survey_ID
+    )
+"""
+
+
+# survey_IDs present in only one of the two tables
+SURVEY_ID_QUERY = """
+    WITH species_surveys AS (
+        SELECT DISTINCT survey_ID
+        FROM `mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_additional_species`
+    ),
+    metadata_surveys AS (
+        SELECT DISTINCT survey_ID
+        FROM `mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_survey_metadata`
     )
     SELECT
-        a.survey_ID,
-        a.species_date,
-        m.metadata_date,
-        a.species_record_count,
-        m.metadata_record_count,
-        a.sample_dates,
-        CASE 
-            WHEN m.survey_ID IS NULL THEN 'Missing in Metadata'
-            WHEN a.species_date != m.metadata_date THEN 'Date Mismatch'
-            ELSE 'Match'
-        END as status,
-        EXTRACT(YEAR FROM a.species_date) as species_year,
-        EXTRACT(MONTH FROM a.species_date) as species_month,
-        EXTRACT(DAY FROM a.species_date) as species_day,
-        EXTRACT(YEAR FROM m.metadata_date) as metadata_year,
-        EXTRACT(MONTH FROM m.metadata_date) as metadata_month,
-        EXTRACT(DAY FROM m.metadata_date) as metadata_day
-    FROM additional_species_dates a
-    LEFT JOIN metadata_dates m
-    ON a.survey_ID = m.survey_ID
-    ORDER BY a.species_date
+        'Only in Additional Species' as location,
+        survey_ID
+    FROM species_surveys
+    WHERE survey_ID NOT IN (SELECT survey_ID FROM metadata_surveys)
+    UNION ALL
+    SELECT
+        'Only in Metadata' as location,
+        survey_ID
+    FROM metadata_surveys
+    WHERE survey_ID NOT IN (SELECT survey_ID FROM species_surveys)
+    ORDER BY location, survey_ID
+"""
+
+
+def compare_dates_between_tables(client):
+    """Compare dates between additional_species and survey_metadata tables"""
+    query = COMPARISON_QUERY + """
+    SELECT *
+    FROM compared
+    ORDER BY species_date
     """
 
-    df = client.query(query).to_dataframe()
-    
-    # Convert dates to datetime
-    df['species_date'] = pd.to_datetime(df['species_date'])
-    df['metadata_date'] = pd.to_datetime(df['metadata_date'])
+    # Submit the row-level query first so BigQuery runs it while the summary
+    # is fetched and printed
+    job = client.query(query)
+    analyze_discrepancies(summarize_discrepancies(client))
+
+    # Arrow hands the DATE columns back as datetime64, no parsing needed, and
+    # the repetitive string columns (status, survey_ID) as categoricals
+    df = job.result().to_arrow().to_pandas(
+        date_as_object=False, strings_to_categorical=True
+    )
     
-    return analyze_discrepancies(df)
+    return df
 
 
-def analyze_discrepancies(df):
-    """Analyze the discrepancies between the two tables"""
+def summarize_discrepancies(client):
+    """Count comparison results per status and date-component difference in
+    BigQuery, with a few suspicious records as samples"""
+    query = COMPARISON_QUERY + """
+    SELECT
+        status,
+        metadata_year - species_year as year_diff,
+        metadata_month - species_month as month_diff,
+        metadata_day - species_day as day_diff,
+        COUNT(*) as record_count,
+        -- Day that could be a year, or invalid month
+        COUNTIF(species_day > 12 OR species_month > 12) as suspicious_count,
+        ARRAY_AGG(
+            IF(species_day > 12 OR species_month > 12,
+               STRUCT(survey_ID, species_date, metadata_date,
+                      species_day, species_month, species_year),
+               NULL)
+            IGNORE NULLS ORDER BY species_date LIMIT 5
+        ) as suspicious_samples
+    FROM compared
+    GROUP BY status, year_diff, month_diff, day_diff
+    """
+
+    return client.query(query).to_dataframe()
+
+
+def date_components(dates):
+    """Split a datetime Series into (year, month, day) int arrays in one pass"""
+    days = dates.to_numpy().astype("datetime64[D]")
+    months = days.astype("datetime64[M]")
+    year = months.astype("datetime64[Y]").astype(int) + 1970
+    month = months.astype(int) % 12 + 1
+    day = (days - months).astype(int) + 1
+    return year, month, day
+
+
+def analyze_discrepancies(summary):
+    """Analyze the discrepancies between the two tables from the per-status
+    summary counts"""
+    total = summary['record_count'].sum()
     print("\nDiscrepancy Analysis:")
-    print(f"Total number of unique survey_ID/date combinations: {len(df)}")
+    print(f"Total number of unique survey_ID/date combinations: {total}")
     
     # Analyze status distribution
-    status_counts = df['status'].value_counts()
+    status_counts = (
+        summary.groupby('status')['record_count'].sum().sort_values(ascending=False)
+    )
     print("\nStatus Distribution:")
     for status, count in status_counts.items():
-        print(f"{status}: {count} ({count/len(df)*100:.1f}%)")
+        print(f"{status}: {count} ({count/total*100:.1f}%)")
 
     # Analyze date components for mismatches
-    mismatches = df[df['status'] == 'Date Mismatch']
+    mismatches = summary[summary['status'] == 'Date Mismatch']
     if not mismatches.empty:
         print("\nDate Component Analysis for Mismatches:")
         print("\nYear differences:")
-        year_diff = mismatches['metadata_year'] - mismatches['species_year']
-        print(year_diff.value_counts().sort_index())
+        print(mismatches.groupby('year_diff')['record_count'].sum().sort_index())
         
         print("\nMonth differences:")
-        month_diff = mismatches['metadata_month'] - mismatches['species_month']
-        print(month_diff.value_counts().sort_index())
+        print(mismatches.groupby('month_diff')['record_count'].sum().sort_index())
         
         print("\nDay differences:")
-        day_diff = mismatches['metadata_day'] - mismatches['species_day']
-        print(day_diff.value_counts().sort_index())
+        print(mismatches.groupby('day_diff')['record_count'].sum().sort_index())
         
         # Check for potential date format issues
         print("\nPotential date format issues:")
-        suspicious = mismatches[
-            (mismatches['species_day'] > 12) |  # Day that could be a year
-            (mismatches['species_month'] > 12)   # Invalid month
-        ]
-        if not suspicious.empty:
-            print(f"Found {len(suspicious)} records with suspicious date components")
+        suspicious_count = mismatches['suspicious_count'].sum()
+        if suspicious_count:
+            print(f"Found {suspicious_count} records with suspicious date components")
             print("\nSample of suspicious records:")
-            print(suspicious[['survey_ID', 'species_date', 'metadata_date', 
-                            'species_day', 'species_month', 'species_year']].head())
+            samples = pd.DataFrame(
+                [sample for group in mismatches['suspicious_samples'] for sample in group]
+            )
+            print(samples.sort_values('species_date').head())
 
-    return df
+    return summary
 
 
-def analyze_survey_id_patterns(client):
-    """Analyze patterns in survey_IDs between the tables"""
-    query = """
-    WITH species_surveys AS (
-        SELECT DISTINCT survey_ID
-        FROM `mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_additional_species`
-    ),
-    metadata_surveys AS (
-        SELECT DISTINCT survey_ID
-        FROM `mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_survey_metadata`
-    )
-    SELECT
-        'Only in Additional Species' as location,
-        survey_ID
-    FROM species_surveys
-    WHERE survey_ID NOT IN (SELECT survey_ID FROM metadata_surveys)
-    UNION ALL
-    SELECT
-        'Only in Metadata' as location,
-        survey_ID
-    FROM metadata_surveys
-    WHERE survey_ID NOT IN (SELECT survey_ID FROM species_surveys)
-    ORDER BY location, survey_ID
-    """
-
-    df = client.query(query).to_dataframe()
+def analyze_survey_id_patterns(job):
+    """Analyze patterns in survey_IDs between the tables, from a started
+    SURVEY_ID_QUERY job"""
+    df = job.result().to_arrow().to_pandas(strings_to_categorical=True)
     
     print("\nSurvey ID Pattern Analysis:")
     print(df['location'].value_counts())
@@ -151,40 +212,43 @@ def plot_discrepancies(df):
     ax1.set_ylabel('Count')
     plt.setp(ax1.xaxis.get_majorticklabels(), rotation=45)
 
-    # Plot 2: Timeline of Discrepancies
-    for status in df['status'].unique():
-        subset = df[df['status'] == status]
-        ax2.scatter(subset['species_date'], 
-                   [status] * len(subset), 
-                   alpha=0.5, 
-                   label=status)
+    # Plot 2: Timeline of Discrepancies (one scatter, status encoded as ints)
+    codes, statuses = pd.factorize(df['status'])
+    ax2.scatter(df['species_date'], codes, c=codes, cmap='tab10', 
+               vmin=0, vmax=9, s=4, alpha=0.5)
+    ax2.set_yticks(range(len(statuses)))
+    ax2.set_yticklabels(statuses)
     
     ax2.set_title('Timeline of Discrepancies')
     ax2.set_xlabel('Date')
     plt.setp(ax2.xaxis.get_majorticklabels(), rotation=45)
-    ax2.legend()
 
     plt.tight_layout()
-    plt.savefig('gridveg_discrepancies.png')
+    fig.savefig('gridveg_discrepancies.png')
+    plt.close(fig)
 
 
 def analyze_year_offset_pattern(df):
     """Analyze the apparent 11-year offset pattern in dates"""
-    mismatches = df[df['status'] == 'Date Mismatch'].copy()
+    # take() already returns a new frame, so no defensive copy is needed
+    mismatches = df.take(np.flatnonzero(df['status'] == 'Date Mismatch'))
     
     # Calculate year differences
-    mismatches['year_difference'] = (
-        mismatches['metadata_date'].dt.year - mismatches['species_date'].dt.year
+    year_difference = pd.Series(
+        date_components(mismatches['metadata_date'])[0]
+        - date_components(mismatches['species_date'])[0],
+        index=mismatches.index,
+        name='year_difference',
     )
     
     print("\nYear Difference Analysis:")
-    year_diff_counts = mismatches['year_difference'].value_counts().sort_index()
+    year_diff_counts = year_difference.value_counts().sort_index()
     print(year_diff_counts)
     
     # Check if dates would match if we add 11 years to species_date
-    mismatches['adjusted_species_date'] = mismatches['species_date'] + pd.DateOffset(years=11)
+    adjusted_species_date = mismatches['species_date'] + pd.DateOffset(years=11)
     matches_after_adjustment = (
-        mismatches['adjusted_species_date'].dt.date == 
+        adjusted_species_date.dt.date == 
         mismatches['metadata_date'].dt.date
     ).sum()
     
@@ -192,25 +256,29 @@ def analyze_year_offset_pattern(df):
           f"{matches_after_adjustment} out of {len(mismatches)} "
           f"({matches_after_adjustment/len(mismatches)*100:.1f}%)")
     
+    mismatches['year_difference'] = year_difference
+    mismatches['adjusted_species_date'] = adjusted_species_date
     return mismatches
 
 
 def analyze_date_format_pattern(df):
     """Analyze if dates match when correctly interpreting DD-MM-YY format"""
-    mismatches = df[df['status'] == 'Date Mismatch'].copy()
+    # take() already returns a new frame, so no defensive copy is needed
+    mismatches = df.take(np.flatnonzero(df['status'] == 'Date Mismatch'))
     
     # Extract components assuming YYYY-MM-DD was incorrectly interpreted from DD-MM-YY
-    mismatches['original_day'] = mismatches['species_date'].dt.year  # Current year is original day
-    mismatches['original_month'] = mismatches['species_date'].dt.month
-    mismatches['original_year'] = mismatches['species_date'].dt.day  # Current day is original year
+    year, month, day = date_components(mismatches['species_date'])
+    mismatches['original_day'] = year  # Current year is original day
+    mismatches['original_month'] = month
+    mismatches['original_year'] = day  # Current day is original year
     
     # Reconstruct the date in correct format (adding 2000 to year since it's YY format)
-    mismatches['reconstructed_date'] = pd.to_datetime(
-        {
-            'year': mismatches['original_year'] + 2000,
-            'month': mismatches['original_month'],
-            'day': mismatches['original_day']
-        }
+    # with datetime64 arithmetic; days that overflow their month become NaT
+    month_start = (day + 2000 - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (month - 1)
+    reconstructed = month_start.astype('datetime64[D]') + (year - 1)
+    valid = (year >= 1) & (reconstructed.astype('datetime64[M]') == month_start)
+    mismatches['reconstructed_date'] = pd.DatetimeIndex(
+        np.where(valid, reconstructed, np.datetime64('NaT'))
     )
     
     # Check how many dates match after reconstruction
@@ -235,6 +303,10 @@ def analyze_date_format_pattern(df):
 def main():
     client = connect_to_bigquery()
     
+    # Start the independent survey ID scan so it runs alongside the date
+    # comparison queries instead of after them
+    survey_id_job = client.query(SURVEY_ID_QUERY)
+    
     # Compare dates between tables
     discrepancies_df = compare_dates_between_tables(client)
     
@@ -242,15 +314,16 @@ def main():
     year_pattern_df = analyze_year_offset_pattern(discrepancies_df)
     
     # Analyze survey ID patterns
-    survey_patterns_df = analyze_survey_id_patterns(client)
+    survey_patterns_df = analyze_survey_id_patterns(survey_id_job)
     
     # Create visualizations
     plot_discrepancies(discrepancies_df)
     
-    # Save results to CSV for further analysis
-    discrepancies_df.to_csv('gridveg_date_discrepancies.csv', index=False)
-    survey_patterns_df.to_csv('gridveg_survey_patterns.csv', index=False)
-    year_pattern_df.to_csv('gridveg_year_pattern_analysis.csv', index=False)
+    # Save results to Parquet for further analysis (keeps dates and
+    # categoricals typed, no per-value text formatting)
+    discrepancies_df.to_parquet('gridveg_date_discrepancies.parquet', engine='pyarrow', index=False)
+    survey_patterns_df.to_parquet('gridveg_survey_patterns.parquet', engine='pyarrow', index=False)
+    year_pattern_df.to_parquet('gridveg_year_pattern_analysis.parquet', engine='pyarrow', index=False)
 
 
 if __name__ == "__main__":
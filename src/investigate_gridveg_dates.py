@@ -1,25 +1,47 @@
 from google.cloud import bigquery
+from google.cloud import bigquery_storage
+from google.api_core.exceptions import Forbidden, NotFound
 import pandas as pd
+import matplotlib
+
+# Non-interactive backend: the histogram is only ever written to a PNG file
+matplotlib.use("Agg")
+import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
+import numpy as np
 from datetime import datetime
+import argparse
+import functools
+import hashlib
+import os
+
+SPECIES_TABLE = "mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_additional_species"
+METADATA_TABLE = "mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_survey_metadata"
+# Species rows joined to their survey metadata, rebuilt with --refresh-flat
+# whenever either source table changes so the metadata analyses don't each
+# repeat the join
+FLAT_TABLE = "mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_additional_species_flat"
+FLAT_SELECT = f"""
+        SELECT
+            a.survey_ID,
+            a.date,
+            m.date as metadata_date,
+            m.survey_ID IS NOT NULL as has_metadata
+        FROM `{SPECIES_TABLE}` a
+        LEFT JOIN `{METADATA_TABLE}` m
+        ON a.survey_ID = m.survey_ID
+        """
 
+# Local cache for query results, invalidated when a source table changes
+CACHE_DIR = "data/interim"
 
-def connect_to_bigquery():
-    """Create a BigQuery client"""
-    return bigquery.Client()
+# Results smaller than this are read from the query response pages; the
+# Storage API's stream setup only pays off for larger downloads
+BQSTORAGE_MIN_ROWS = 10_000
 
 
-def get_table_schema(client, table_id):
-    """Get and print the schema of a specified table"""
-    table = client.get_table(table_id)
-    print("\nTable Schema:")
-    for field in table.schema:
-        print(f"{field.name}: {field.field_type} ({field.mode})")
-
-
-def analyze_dates(client):
-    """Analyze dates in the gridVeg_additional_species table"""
-    query = """
+# Rows per distinct date in the species table
+DATES_QUERY = """
     SELECT 
         date,
         COUNT(*) as count
@@ -29,39 +51,20 @@ def analyze_dates(client):
     ORDER BY date
     """
 
-    df = client.query(query).to_dataframe()
-    df["date"] = pd.to_datetime(df["date"])
-
-    print("\nDate Analysis:")
-    print(f"Total unique dates: {len(df)}")
-    print(f"Date range: from {df['date'].min()} to {df['date'].max()}")
-
-    # Identify dates affected by the transformation error (after 2024)
-    future_dates = df[df["date"].dt.year > 2024]
-    if not future_dates.empty:
-        print("\nDates affected by transformation error (after 2024):")
-        print(future_dates)
-        print(f"\nNumber of records with affected dates: {future_dates['count'].sum()}")
-
-    return df
-
-
-def analyze_with_metadata(client):
-    """Cross reference dates with survey metadata and look for patterns"""
-    query = """
+# The first post-2024 dates beside their metadata dates, checking whether the
+# day of the correct date became the year of the stored one. {flat} is
+# FLAT_TABLE or the same join inline, see flat_source
+DATE_PATTERN_QUERY = """
     WITH additional_species AS (
         SELECT 
-            a.survey_ID,
-            a.date as incorrect_date,
-            m.date as correct_date,
-            FORMAT_DATE('%d-%m-%y', m.date) as original_format,
-            FORMAT_DATE('%Y-%m-%d', a.date) as transformed_date
+            survey_ID,
+            date as incorrect_date,
+            metadata_date as correct_date,
+            FORMAT_DATE('%d-%m-%y', metadata_date) as original_format,
+            FORMAT_DATE('%Y-%m-%d', date) as transformed_date
         FROM 
-            `mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_additional_species` a
-        LEFT JOIN 
-            `mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_survey_metadata` m
-        ON a.survey_ID = m.survey_ID
-        WHERE a.date > '2024-12-31'
+            {flat}
+        WHERE date > '2024-12-31'
     )
     SELECT 
         survey_ID,
@@ -80,119 +83,312 @@ def analyze_with_metadata(client):
     LIMIT 10
     """
 
-    df = client.query(query).to_dataframe()
-    if not df.empty:
-        print("\nDate Transformation Pattern Analysis:")
-        print("Showing how DD-MM-YY was incorrectly transformed to YYYY-MM-DD")
-        print("\nExample records:")
-        for _, row in df.iterrows():
-            print(f"\nSurvey ID: {row['survey_ID']}")
-            print(f"Original format (DD-MM-YY): {row['original_format']}")
-            print(f"Incorrect transform: {row['transformed_date']}")
-            print(f"Correct date: {row['correct_date'].strftime('%Y-%m-%d')}")
-            print(f"Pattern check: {row['pattern_check']}")
-
-    return df
-
-
-def analyze_metadata_coverage(client):
-    """Analyze how many additional_species records can be matched with metadata"""
-    coverage_query = """
+# One aggregate row of how many survey_ID/date pairs have metadata
+COVERAGE_QUERY = """
     WITH additional_species_dates AS (
         SELECT DISTINCT
             survey_ID,
-            date as species_date
+            date as species_date,
+            metadata_date
         FROM 
-            `mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_additional_species`
+            {flat}
     )
     SELECT
         COUNT(*) as total_species_records,
-        COUNTIF(m.date IS NOT NULL) as matched_with_metadata,
-        COUNTIF(m.date IS NULL) as unmatched_records,
-        COUNTIF(a.species_date > '2024-12-31' AND m.date IS NULL) as future_dates_without_metadata
-    FROM additional_species_dates a
-    LEFT JOIN 
-        `mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_survey_metadata` m
-    ON a.survey_ID = m.survey_ID
+        COUNTIF(metadata_date IS NOT NULL) as matched_with_metadata,
+        COUNTIF(metadata_date IS NULL) as unmatched_records,
+        COUNTIF(species_date > '2024-12-31' AND metadata_date IS NULL) as future_dates_without_metadata
+    FROM additional_species_dates
     """
 
-    # Query to examine unmatched records
-    unmatched_query = """
-    WITH additional_species_dates AS (
-        SELECT DISTINCT
+# Unmatched records, summarized in BigQuery (distinct survey_IDs and a
+# per-year distribution) plus a five-row sample, instead of downloading
+# every unmatched row to print a handful of numbers
+UNMATCHED_CTE = """
+    WITH unmatched AS (
+        SELECT
             survey_ID,
             date as species_date,
             COUNT(*) as record_count
         FROM 
-            `mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_additional_species`
+            {flat}
+        WHERE NOT has_metadata
         GROUP BY survey_ID, date
     )
+    """
+UNMATCHED_YEARS_QUERY = UNMATCHED_CTE + """
     SELECT
-        a.survey_ID,
-        a.species_date,
-        a.record_count
-    FROM additional_species_dates a
-    LEFT JOIN 
-        `mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_survey_metadata` m
-    ON a.survey_ID = m.survey_ID
-    WHERE m.survey_ID IS NULL
-    ORDER BY a.species_date
+        EXTRACT(YEAR FROM species_date) as year,
+        COUNT(*) as count,
+        (SELECT COUNT(DISTINCT survey_ID) FROM unmatched) as unique_survey_ids
+    FROM unmatched
+    GROUP BY year
+    ORDER BY year
+    """
+UNMATCHED_SAMPLE_QUERY = UNMATCHED_CTE + """
+    SELECT *
+    FROM unmatched
+    ORDER BY species_date
+    LIMIT 5
     """
 
-    df = client.query(coverage_query).to_dataframe()
-    unmatched_df = client.query(unmatched_query).to_dataframe()
 
-    # Convert species_date to datetime
-    unmatched_df["species_date"] = pd.to_datetime(unmatched_df["species_date"])
+@functools.cache
+def connect_to_bigquery():
+    """Create a BigQuery client, reused for the rest of the process"""
+    return bigquery.Client()
+
+
+@functools.cache
+def get_table(client, table_id):
+    """Fetch a table's metadata once per process. Call get_table.cache_clear()
+    after changing a table so later lookups see its new state."""
+    return client.get_table(table_id)
+
+
+@functools.cache
+def connect_to_bigquery_storage():
+    """Create a BigQuery Storage read client, reused for the rest of the process"""
+    return bigquery_storage.BigQueryReadClient()
 
+
+def fetch_dataframe(job):
+    """Wait for a query job and download its rows, streaming them as Arrow over
+    the BigQuery Storage API when the result is large"""
+    rows = job.result()
+    if rows.total_rows is not None and rows.total_rows >= BQSTORAGE_MIN_ROWS:
+        return rows.to_dataframe(bqstorage_client=connect_to_bigquery_storage())
+    return rows.to_dataframe(create_bqstorage_client=False)
+
+
+def load_or_query(client, name, query, table_ids, small=False):
+    """Load query results from the local Parquet cache, or run the query and
+    cache them. The cache is keyed on the query text and the last-modified time
+    of every table in table_ids, so re-runs skip BigQuery until data changes.
+    Small (single-page) results are fetched inline with query_and_wait."""
+    key_parts = [query] + [
+        get_table(client, table_id).modified.isoformat() for table_id in table_ids
+    ]
+    cache_key = hashlib.sha256("\n".join(key_parts).encode()).hexdigest()[:16]
+    cache_file = os.path.join(CACHE_DIR, f"{name}_{cache_key}.parquet")
+
+    if os.path.exists(cache_file):
+        print(f"Loading cached {name} results from {cache_file}")
+        return pd.read_parquet(cache_file, engine="pyarrow")
+
+    if small:
+        df = client.query_and_wait(query).to_dataframe(create_bqstorage_client=False)
+    else:
+        df = fetch_dataframe(client.query(query))
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    df.to_parquet(cache_file, engine="pyarrow", index=False)
+
+    return df
+
+
+def flat_table_is_current(client):
+    """Whether FLAT_TABLE exists and is at least as new as its sources"""
+    sources_modified = max(
+        get_table(client, table_id).modified for table_id in (SPECIES_TABLE, METADATA_TABLE)
+    )
+    try:
+        return get_table(client, FLAT_TABLE).modified >= sources_modified
+    except (NotFound, Forbidden):
+        return False
+
+
+def ensure_flat_table(client):
+    """Create or refresh FLAT_TABLE if it is missing or older than its sources"""
+    if flat_table_is_current(client):
+        return
+
+    print(f"\nRebuilding {FLAT_TABLE}...")
+    client.query_and_wait(
+        f"""
+        CREATE OR REPLACE TABLE `{FLAT_TABLE}`
+        PARTITION BY DATE_TRUNC(date, MONTH)
+        CLUSTER BY survey_ID
+        AS
+        {FLAT_SELECT}
+        """
+    )
+    get_table.cache_clear()
+
+
+def flat_source(client, refresh=False):
+    """Return what the metadata analyses read the joined rows from, and the
+    tables its results depend on.
+
+    That is FLAT_TABLE when it is current (rebuilt first with refresh=True),
+    otherwise the join inline, which only needs read access.
+    """
+    if refresh:
+        try:
+            ensure_flat_table(client)
+        except Forbidden as e:
+            print(f"\nCannot rebuild {FLAT_TABLE} ({e}); joining inline instead")
+
+    if flat_table_is_current(client):
+        return f"`{FLAT_TABLE}`", [FLAT_TABLE]
+
+    if not refresh:
+        print(
+            f"\n{FLAT_TABLE} is missing or stale; joining inline (see --refresh-flat)"
+        )
+    return f"({FLAT_SELECT})", [SPECIES_TABLE, METADATA_TABLE]
+
+
+def get_table_schema(client, table_id):
+    """Get and print the schema of a specified table"""
+    table = get_table(client, table_id)
+    print("\nTable Schema:")
+    for field in table.schema:
+        print(f"{field.name}: {field.field_type} ({field.mode})")
+
+
+def analyze_dates(client):
+    """Analyze dates in the gridVeg_additional_species table"""
+    df = load_or_query(client, "gridveg_dates", DATES_QUERY, [SPECIES_TABLE])
+    df["date"] = pd.to_datetime(df["date"])
+
+    print("\nDate Analysis:")
+    print(f"Total unique dates: {len(df)}")
+    print(f"Date range: from {df['date'].min()} to {df['date'].max()}")
+
+    # Identify dates affected by the transformation error (after 2024)
+    future_dates = df[df["date"].dt.year > 2024]
+    if not future_dates.empty:
+        print("\nDates affected by transformation error (after 2024):")
+        print(future_dates)
+        print(f"\nNumber of records with affected dates: {future_dates['count'].sum()}")
+
+    return df
+
+
+def analyze_with_metadata(client, flat, flat_tables):
+    """Cross reference dates with survey metadata and look for patterns"""
+    # LIMIT 10: the whole result comes back inline with the jobs.query response
+    df = load_or_query(
+        client,
+        "gridveg_date_pattern",
+        DATE_PATTERN_QUERY.format(flat=flat),
+        flat_tables,
+        small=True,
+    )
     if not df.empty:
+        print("\nDate Transformation Pattern Analysis:")
+        print("Showing how DD-MM-YY was incorrectly transformed to YYYY-MM-DD")
+        print("\nExample records:")
+        for _, row in df.iterrows():
+            print(f"\nSurvey ID: {row['survey_ID']}")
+            print(f"Original format (DD-MM-YY): {row['original_format']}")
+            print(f"Incorrect transform: {row['transformed_date']}")
+            print(f"Correct date: {row['correct_date'].strftime('%Y-%m-%d')}")
+            print(f"Pattern check: {row['pattern_check']}")
+
+    return df
+
+
+def analyze_metadata_coverage(client, flat):
+    """Analyze how many additional_species records can be matched with metadata"""
+    # Submit both unmatched queries before waiting on any result
+    job_config = bigquery.QueryJobConfig(use_query_cache=True)
+    years_job = client.query(
+        UNMATCHED_YEARS_QUERY.format(flat=flat), job_config=job_config
+    )
+    sample_job = client.query(
+        UNMATCHED_SAMPLE_QUERY.format(flat=flat), job_config=job_config
+    )
+
+    # The coverage query is a single aggregate row, so read it straight off the
+    # result iterator instead of building a DataFrame
+    coverage = next(iter(client.query_and_wait(COVERAGE_QUERY.format(flat=flat))))
+    unmatched_years = fetch_dataframe(years_job)
+    unmatched_df = fetch_dataframe(sample_job)
+
+    if coverage["total_species_records"]:
         print("\nMetadata Coverage Analysis:")
         print(
-            f"Total unique survey_ID/date combinations: {df['total_species_records'].iloc[0]}"
+            f"Total unique survey_ID/date combinations: {coverage['total_species_records']}"
         )
-        print(f"Records with matching metadata: {df['matched_with_metadata'].iloc[0]}")
-        print(f"Records without metadata: {df['unmatched_records'].iloc[0]}")
+        print(f"Records with matching metadata: {coverage['matched_with_metadata']}")
+        print(f"Records without metadata: {coverage['unmatched_records']}")
         print(
-            f"Future dates without metadata: {df['future_dates_without_metadata'].iloc[0]}"
+            f"Future dates without metadata: {coverage['future_dates_without_metadata']}"
         )
 
         # Calculate percentages
-        total = df["total_species_records"].iloc[0]
-        matched = df["matched_with_metadata"].iloc[0]
+        total = coverage["total_species_records"]
+        matched = coverage["matched_with_metadata"]
         print(f"\nMetadata coverage: {(matched/total*100):.1f}%")
 
-        if not unmatched_df.empty:
+        if not unmatched_years.empty:
             print("\nUnmatched Records Analysis:")
             print(
-                f"Number of unique survey_IDs without metadata: {unmatched_df['survey_ID'].nunique()}"
+                f"Number of unique survey_IDs without metadata: {unmatched_years['unique_survey_ids'].iloc[0]}"
             )
             print("\nSample of unmatched records:")
-            print(unmatched_df.head())
+            print(unmatched_df)
 
             # Year distribution of unmatched records
             print("\nYear distribution of unmatched records:")
-            year_dist = unmatched_df["species_date"].dt.year.value_counts().sort_index()
+            year_dist = unmatched_years.set_index("year")["count"]
             print(year_dist)
 
-    return df, unmatched_df
+    return coverage, unmatched_df
 
 
 def check_related_tables(client):
-    """Query related tables that might have corresponding date information"""
-    query = """
-    SELECT 
-        table_name
-    FROM 
-        mpg-data-warehouse.vegetation_point_intercept_gridVeg.INFORMATION_SCHEMA.TABLES
-    """
-
-    tables_df = client.query(query).to_dataframe()
+    """List related tables that might have corresponding date information"""
+    # tables.list is a metadata call, so no query job or slots are involved
     print("\nRelated tables in the dataset:")
-    for table in tables_df["table_name"]:
-        print(f"- {table}")
+    for table in client.list_tables(
+        "mpg-data-warehouse.vegetation_point_intercept_gridVeg"
+    ):
+        print(f"- {table.table_id}")
+
+
+def plot_date_histogram(dates_df):
+    """Save a histogram of the distinct dates to date_distribution.png"""
+    # Bin the int64 nanosecond values with numpy rather than going through
+    # matplotlib's datetime conversion and binning in plt.hist
+    dates = dates_df["date"].dropna().to_numpy(dtype="datetime64[ns]")
+    counts, edges = np.histogram(dates.view("i8"), bins=50)
+    edges = mdates.date2num(edges.astype("i8").view("datetime64[ns]"))
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align="edge")
+    ax.xaxis_date()
+    ax.set_title("Distribution of Dates in gridVeg_additional_species")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Count")
+    ax.tick_params(axis="x", labelrotation=45)
+    fig.tight_layout()
+    fig.savefig("date_distribution.png")
+    plt.close(fig)
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Investigate the gridVeg additional species dates"
+    )
+    parser.add_argument(
+        "--plot",
+        action="store_true",
+        help="Save a histogram of the dates to date_distribution.png",
+    )
+    parser.add_argument(
+        "--refresh-flat",
+        action="store_true",
+        help=f"Rebuild {FLAT_TABLE} if it is missing or stale (needs write access)",
+    )
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
     client = connect_to_bigquery()
     table_id = "mpg-data-warehouse.vegetation_point_intercept_gridVeg.gridVeg_additional_species"
 
@@ -202,24 +398,21 @@ def main():
     # Analyze dates
     dates_df = analyze_dates(client)
 
+    # Species rows joined to survey metadata for the analyses below
+    flat, flat_tables = flat_source(client, refresh=args.refresh_flat)
+
     # Analyze dates with metadata
-    metadata_analysis = analyze_with_metadata(client)
+    metadata_analysis = analyze_with_metadata(client, flat, flat_tables)
 
     # Analyze metadata coverage
-    coverage_analysis, unmatched_df = analyze_metadata_coverage(client)
+    coverage_analysis, unmatched_df = analyze_metadata_coverage(client, flat)
 
     # Check related tables
     check_related_tables(client)
 
     # Optional: Create a histogram of dates
-    plt.figure(figsize=(12, 6))
-    plt.hist(dates_df["date"], bins=50)
-    plt.title("Distribution of Dates in gridVeg_additional_species")
-    plt.xlabel("Date")
-    plt.ylabel("Count")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig("date_distribution.png")
+    if args.plot:
+        plot_date_histogram(dates_df)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,45 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import hashlib
+
+
+# Parquet key-value metadata entry recording which source and parse the
+# cached file was built from
+CACHE_KEY = b"source_key"
+
+
+def cache_key(source_file, spec):
+    """Hash the source file's size and mtime together with the parse spec."""
+    stat = source_file.stat()
+    return hashlib.sha256(
+        f"{stat.st_size}:{stat.st_mtime_ns}:{spec!r}".encode()
+    ).hexdigest()
+
+
+def prepare_parquet(source_file, cache_file, read_source, spec):
+    """Convert source_file to a typed Parquet file at cache_file unless the
+    cached copy was built from the same source and spec.
+
+    read_source returns the parsed source as a DataFrame. spec is the schema
+    and read options it parses with; any change to the source file's size or
+    mtime, or to spec, rebuilds the cache.
+    """
+    key = cache_key(source_file, spec).encode()
+    if cache_file.exists():
+        metadata = pq.read_schema(cache_file).metadata or {}
+        if metadata.get(CACHE_KEY) == key:
+            return cache_file
+
+    print(f"Converting {source_file.name} to Parquet...")
+    table = pa.Table.from_pandas(read_source(), preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, CACHE_KEY: key})
+
+    # Written next to the cache and renamed, so a failed run never leaves a
+    # half-written file behind
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    partial_file = cache_file.with_name(f"{cache_file.name}.partial")
+    pq.write_table(table, partial_file, compression="zstd")
+    partial_file.replace(cache_file)
+    print(f"Data saved to {cache_file}")
+
+    return cache_file
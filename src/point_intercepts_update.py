@@ -1,13 +1,131 @@
+import io
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import csv as pacsv
 from pathlib import Path
 from google.cloud import bigquery
 import argparse
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import functools
 import logging
+import logging.handlers
+import queue
 import sys
 
-
-def setup_logging(table_id, table_type):
+from flush_staging import stage_parquet
+from parquet_cache import prepare_parquet
+
+
+SOURCE_FILE = (
+    Path(__file__).parents[2]
+    / "data/external/2024-10-21_gridVeg_point_intercepts_SOURCE.csv"
+)
+
+# Typed Parquet copy of SOURCE_FILE, rebuilt whenever the CSV or the way it is
+# parsed changes
+PARQUET_CACHE = (
+    Path(__file__).parents[2]
+    / "data/interim/2024-10-21_gridVeg_point_intercepts.parquet"
+)
+
+# Arrow types of the source CSV columns, so the parser never has to infer them
+# (sparse hit columns would otherwise come back as all-null or string)
+SOURCE_COLUMN_TYPES = {
+    "Survey Data::__kp_Survey": pa.string(),
+    "Survey Data::_kf_Site": pa.int64(),
+    "Survey Data::SurveyDate": pa.timestamp("s"),
+    "Survey Data::SurveyYear": pa.int64(),
+    "PointTrans": pa.string(),
+    "_kf_Hit1_serial": pa.int64(),
+    "Height": pa.float64(),
+    "_kf_Hit2_serial": pa.int64(),
+    "_kf_Hit3_serial": pa.int64(),
+    "_kf_Hit4_serial": pa.int64(),
+    "GroundCover": pa.string(),
+}
+
+# Arrow CSV options for the source: only the known columns, typed up front; the
+# export writes dates as m/d/yy and leaves missing values empty
+SOURCE_CONVERT_OPTIONS = {
+    "column_types": SOURCE_COLUMN_TYPES,
+    "include_columns": list(SOURCE_COLUMN_TYPES),
+    "timestamp_parsers": ["%m/%d/%y"],
+    "null_values": ["", "NA"],
+    "strings_can_be_null": True,
+}
+
+# Source columns each table is built from, mapped to their BigQuery names
+VEGETATION_COLUMNS = {
+    "Survey Data::__kp_Survey": "survey_ID",
+    "Survey Data::_kf_Site": "grid_point",
+    "Survey Data::SurveyDate": "date",
+    "Survey Data::SurveyYear": "year",
+    "PointTrans": "transect_point",
+    "Height": "height_intercept_1",
+    "_kf_Hit1_serial": "intercept_1",
+    "_kf_Hit2_serial": "intercept_2",
+    "_kf_Hit3_serial": "intercept_3",
+    "_kf_Hit4_serial": "intercept_4",
+}
+GROUND_COLUMNS = {
+    "Survey Data::__kp_Survey": "survey_ID",
+    "Survey Data::_kf_Site": "grid_point",
+    "Survey Data::SurveyDate": "date",
+    "Survey Data::SurveyYear": "year",
+    "PointTrans": "transect_point",
+    "_kf_Hit1_serial": "intercept_1",
+    "GroundCover": "intercept_ground_code",
+}
+
+# BigQuery schemas of the two tables
+VEGETATION_SCHEMA = [
+    bigquery.SchemaField("survey_ID", "STRING", mode="NULLABLE"),
+    bigquery.SchemaField("grid_point", "INTEGER", mode="NULLABLE"),
+    bigquery.SchemaField("date", "DATE", mode="NULLABLE"),
+    bigquery.SchemaField("year", "INTEGER", mode="NULLABLE"),
+    bigquery.SchemaField("transect_point", "STRING", mode="NULLABLE"),
+    bigquery.SchemaField("height_intercept_1", "NUMERIC", mode="NULLABLE"),
+    bigquery.SchemaField("intercept_1", "INTEGER", mode="NULLABLE"),
+    bigquery.SchemaField("intercept_2", "INTEGER", mode="NULLABLE"),
+    bigquery.SchemaField("intercept_3", "INTEGER", mode="NULLABLE"),
+    bigquery.SchemaField("intercept_4", "INTEGER", mode="NULLABLE"),
+]
+
+GROUND_SCHEMA = [
+    bigquery.SchemaField("survey_ID", "STRING", mode="NULLABLE"),
+    bigquery.SchemaField("grid_point", "INTEGER", mode="NULLABLE"),
+    bigquery.SchemaField("date", "DATE", mode="NULLABLE"),
+    bigquery.SchemaField("year", "INTEGER", mode="NULLABLE"),
+    bigquery.SchemaField("transect_point", "STRING", mode="NULLABLE"),
+    bigquery.SchemaField("intercept_1", "INTEGER", mode="NULLABLE"),
+    bigquery.SchemaField("intercept_ground_code", "STRING", mode="NULLABLE"),
+]
+
+# Transect point labels: a compass direction and a one or two digit distance.
+# Kept as a string: on Arrow string columns pandas hands it to pyarrow.compute,
+# which compiles it once and matches in C, and older pandas releases reject a
+# precompiled re.Pattern on that path
+TRANSECT_POINT_PATTERN = r"^[NSEW]\d{1,2}$"
+
+# Arrow types of the Parquet upload for each BigQuery column type
+ARROW_TYPES = {
+    "STRING": pa.string(),
+    "INTEGER": pa.int64(),
+    "DATE": pa.date32(),
+    "NUMERIC": pa.decimal128(38, 9),
+}
+
+
+@functools.cache
+def connect_to_bigquery():
+    """Create a BigQuery client, reused for the rest of the process"""
+    return bigquery.Client()
+
+
+def setup_logging(table_id, table_type, verbose=False):
     """Setup logging for BigQuery updates."""
     # Create logs directory if it doesn't exist
     log_dir = Path(__file__).parents[2] / "logs"
@@ -20,7 +138,7 @@ def setup_logging(table_id, table_type):
 
     # Configure logging
     logger = logging.getLogger(f"{__name__}_{table_type}")
-    logger.setLevel(logging.INFO)
+    logger.setLevel(logging.DEBUG if verbose else logging.INFO)
 
     # Clear any existing handlers
     logger.handlers = []
@@ -31,9 +149,19 @@ def setup_logging(table_id, table_type):
     file_handler.setFormatter(formatter)
     stream_handler = logging.StreamHandler()
     stream_handler.setFormatter(formatter)
+    # Progress is already printed, so the console only repeats problems
+    stream_handler.setLevel(logging.WARNING)
+
+    # Handlers run on a listener thread, so log writes don't block processing;
+    # the listener is stopped (and the queue drained) at exit
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
 
-    logger.addHandler(file_handler)
-    logger.addHandler(stream_handler)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
 
     return logger
 
@@ -67,116 +195,155 @@ def parse_args():
         action="store_true",
         help="Skip processing of ground cover table",
     )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        help="Stream the CSV in chunks of this many rows to bound memory use",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Log column dtypes, sample rows and per-column null counts",
+    )
+    parser.add_argument(
+        "--staging-dir",
+        help=(
+            "Write Parquet to this GCS staging area instead of loading it; "
+            "load once per day with flush_staging.py (format: gs://bucket/prefix)"
+        ),
+    )
     return parser.parse_args()
 
 
-def load_data():
-    """Load the point intercepts data from CSV file."""
-    file_path = (
-        Path(__file__).parents[2]
-        / "data/external/2024-10-21_gridVeg_point_intercepts_SOURCE.csv"
+def read_source_csv():
+    """Read the point intercepts source CSV."""
+    # Arrow's multithreaded reader, typed by SOURCE_CONVERT_OPTIONS
+    table = pacsv.read_csv(
+        SOURCE_FILE, convert_options=pacsv.ConvertOptions(**SOURCE_CONVERT_OPTIONS)
     )
-    df = pd.read_csv(file_path)
+    df = table.to_pandas(types_mapper=pd.ArrowDtype)
     return df
 
 
-def transform_vegetation_data(df):
+def prepare_source_parquet():
+    """Convert the source CSV to a typed Parquet file unless it is up to date."""
+    return prepare_parquet(
+        SOURCE_FILE, PARQUET_CACHE, read_source_csv, SOURCE_CONVERT_OPTIONS
+    )
+
+
+def load_data(columns):
+    """Load the given point intercepts columns from its Parquet copy of the CSV."""
+    # Columns that aren't requested are never read from the Parquet copy
+    return pd.read_parquet(
+        prepare_source_parquet(),
+        columns=list(columns),
+        engine="pyarrow",
+        dtype_backend="pyarrow",
+    )
+
+
+def load_data_chunks(chunksize, columns):
+    """Load the given point intercepts columns from CSV file in chunks."""
+    # pyarrow.csv cannot stop at a row count, so stream with the C parser; the
+    # other columns are still stored in Arrow with the types load_data uses
+    return pd.read_csv(
+        SOURCE_FILE,
+        usecols=list(columns),
+        dtype={
+            col: pd.ArrowDtype(SOURCE_COLUMN_TYPES[col])
+            for col in columns
+            if col != "Survey Data::SurveyDate"
+        },
+        parse_dates=["Survey Data::SurveyDate"],
+        date_format="%m/%d/%y",
+        na_values=["NA"],
+        chunksize=chunksize,
+    )
+
+
+def transform_vegetation_data(df, logger=None):
     """Transform the data for vegetation table."""
-    df_transformed = df.copy()
-
-    # Rename columns
-    df_transformed = df_transformed.rename(
-        columns={
-            "Survey Data::__kp_Survey": "survey_ID",
-            "Survey Data::_kf_Site": "grid_point",
-            "Survey Data::SurveyDate": "date",
-            "Survey Data::SurveyYear": "year",
-            "PointTrans": "transect_point",
-            "Height": "height_intercept_1",
-            "_kf_Hit1_serial": "intercept_1",
-            "_kf_Hit2_serial": "intercept_2",
-            "_kf_Hit3_serial": "intercept_3",
-            "_kf_Hit4_serial": "intercept_4",
-        }
+    # Rename columns. The renamed frame shares data with the caller's df;
+    # the steps below only replace whole columns
+    df_transformed = df.rename(
+        columns=VEGETATION_COLUMNS,
+        copy=False,
     )
 
-    # Convert date format
-    df_transformed["date"] = pd.to_datetime(df_transformed["date"])
+    # Convert date format (a no-op when load_data already parsed it; the
+    # explicit m/d/yy format keeps string input off the per-element fallback)
+    df_transformed["date"] = pd.to_datetime(
+        df_transformed["date"], format="%m/%d/%y", cache=True
+    )
 
-    # Convert numeric fields
-    df_transformed["grid_point"] = pd.to_numeric(df_transformed["grid_point"])
-    df_transformed["year"] = pd.to_numeric(df_transformed["year"])
+    # Convert numeric fields (skipped when read_csv already typed them)
+    for col in ["grid_point", "year"]:
+        if not pd.api.types.is_numeric_dtype(df_transformed[col]):
+            df_transformed[col] = pd.to_numeric(df_transformed[col])
 
     # Handle nullable numeric fields
-    numeric_columns = [
-        "height_intercept_1",
-        "intercept_1",
-        "intercept_2",
-        "intercept_3",
-        "intercept_4",
-    ]
-    for col in numeric_columns:
-        # Replace empty strings with None before conversion
-        df_transformed[col] = df_transformed[col].replace(["", "NA"], None)
-        if col == "height_intercept_1":
-            # Convert to float for NUMERIC type and handle empty strings
+    # Float for NUMERIC type; nullable integers kept Arrow-backed rather than
+    # a masked Int64
+    numeric_dtypes = {
+        "height_intercept_1": "float32[pyarrow]",
+        "intercept_1": "int64[pyarrow]",
+        "intercept_2": "int64[pyarrow]",
+        "intercept_3": "int64[pyarrow]",
+        "intercept_4": "int64[pyarrow]",
+    }
+    for col, dtype in numeric_dtypes.items():
+        # load_data delivers these as Arrow columns with nulls already in the
+        # validity bitmap; only untyped (string) input needs cleaning first,
+        # and columns already of the target type are not cast again
+        if not pd.api.types.is_numeric_dtype(df_transformed[col]):
             df_transformed[col] = pd.to_numeric(
-                df_transformed[col], errors="coerce", downcast="float"
+                df_transformed[col].replace(["", "NA"], None), errors="coerce"
             )
-        else:
-            # Convert to nullable integer using Int64
-            df_transformed[col] = pd.to_numeric(
-                df_transformed[col], errors="coerce"
-            ).astype("Int64")
-
-    # Add debug logging
-    print("\nColumn dtypes after transformation:")
-    print(df_transformed.dtypes)
-    print("\nSample of height values:")
-    print(df_transformed["height_intercept_1"].head(10))
-    print("\nNull counts:")
-    print(df_transformed.isnull().sum())
+        if df_transformed[col].dtype != dtype:
+            df_transformed[col] = df_transformed[col].astype(dtype)
+
+    # Only scan the frame for diagnostics when they will actually be logged
+    if logger and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Column types after transformation:\n%s", df_transformed.dtypes)
+        logger.debug(
+            "Sample of height values:\n%s",
+            df_transformed["height_intercept_1"].head(10),
+        )
+        logger.debug("Null counts:\n%s", df_transformed.isnull().sum())
 
     return df_transformed
 
 
 def transform_ground_data(df):
     """Transform the data for ground cover table."""
-    df_transformed = df.copy()
-
-    # Rename columns
-    df_transformed = df_transformed.rename(
-        columns={
-            "Survey Data::__kp_Survey": "survey_ID",
-            "Survey Data::_kf_Site": "grid_point",
-            "Survey Data::SurveyDate": "date",
-            "Survey Data::SurveyYear": "year",
-            "PointTrans": "transect_point",
-            "_kf_Hit1_serial": "intercept_1",
-            "GroundCover": "intercept_ground_code",
-        }
+    # Rename columns. The renamed frame shares data with the caller's df;
+    # the steps below only replace whole columns
+    df_transformed = df.rename(
+        columns=GROUND_COLUMNS,
+        copy=False,
     )
 
-    # Convert date format
-    df_transformed["date"] = pd.to_datetime(df_transformed["date"])
-
-    # Convert numeric fields
-    df_transformed["grid_point"] = pd.to_numeric(df_transformed["grid_point"])
-    df_transformed["intercept_1"] = (
-        df_transformed["intercept_1"].replace("", pd.NA).astype("Int64")
+    # Convert date format (a no-op when load_data already parsed it; the
+    # explicit m/d/yy format keeps string input off the per-element fallback)
+    df_transformed["date"] = pd.to_datetime(
+        df_transformed["date"], format="%m/%d/%y", cache=True
     )
 
-    # Select only the columns needed for the ground cover table
-    columns_to_keep = [
-        "survey_ID",
-        "grid_point",
-        "date",
-        "year",
-        "transect_point",
-        "intercept_1",
-        "intercept_ground_code",
-    ]
-    df_transformed = df_transformed[columns_to_keep]
+    # Convert numeric fields (skipped when read_csv already typed them)
+    if not pd.api.types.is_numeric_dtype(df_transformed["grid_point"]):
+        df_transformed["grid_point"] = pd.to_numeric(df_transformed["grid_point"])
+    if not pd.api.types.is_numeric_dtype(df_transformed["intercept_1"]):
+        df_transformed["intercept_1"] = pd.to_numeric(
+            df_transformed["intercept_1"].replace("", None), errors="coerce"
+        )
+    if df_transformed["intercept_1"].dtype != "int64[pyarrow]":
+        df_transformed["intercept_1"] = df_transformed["intercept_1"].astype(
+            "int64[pyarrow]"
+        )
+
+    # Select only the columns needed for the ground cover table, in schema order
+    df_transformed = df_transformed[[field.name for field in GROUND_SCHEMA]]
 
     return df_transformed
 
@@ -216,18 +383,14 @@ def validate_vegetation_data(df, logger=None):
         for line in validation_output:
             print(line)
 
-    # Validate required fields - allow null intercept_1 values
-    required_valid = all(
-        [
-            df["grid_point"].notnull().all(),
-            df["date"].notnull().all(),
-            df["year"].notnull().all(),
-            df["transect_point"].notnull().all(),
-        ]
-    )
+    # Validate required fields - allow null intercept_1 values. Reuses the
+    # null counts above rather than scanning each column again
+    required_valid = not null_counts[
+        ["grid_point", "date", "year", "transect_point"]
+    ].any()
 
     # Validate transect point format
-    transect_format = df["transect_point"].str.match(r"^[NSEW]\d{1,2}$").all()
+    transect_format = df["transect_point"].str.match(TRANSECT_POINT_PATTERN).all()
 
     return required_valid and transect_format
 
@@ -270,61 +433,78 @@ def validate_ground_data(df, logger=None):
         for line in validation_output:
             print(line)
 
-    # Validate required fields
-    required_valid = all(
-        [
-            df["grid_point"].notnull().all(),
-            df["date"].notnull().all(),
-            df["year"].notnull().all(),
-            df["transect_point"].notnull().all(),
-            df["intercept_ground_code"].notnull().all(),
-        ]
-    )
+    # Validate required fields, from the null counts above
+    required_valid = not null_counts[
+        ["grid_point", "date", "year", "transect_point", "intercept_ground_code"]
+    ].any()
 
     # Validate transect point format
-    transect_format = df["transect_point"].str.match(r"^[NSEW]\d{1,2}$").all()
+    transect_format = df["transect_point"].str.match(TRANSECT_POINT_PATTERN).all()
 
     return required_valid and transect_format
 
 
-def upload_to_bigquery(df, table_id, table_type, schema, dry_run=True, logger=None):
-    """Upload the transformed data to BigQuery."""
-    client = bigquery.Client()
+def to_arrow_schema(schema):
+    """Map a BigQuery schema to the Arrow schema of its Parquet upload."""
+    return pa.schema([(field.name, ARROW_TYPES[field.field_type]) for field in schema])
+
+
+def to_arrow_table(df, schema):
+    """Convert transformed data to an Arrow table matching a BigQuery schema."""
+    # Arrow casts the timestamp column to date32 and the float heights to
+    # NUMERIC's decimal(38, 9), so BigQuery loads them without per-row fixes
+    return pa.Table.from_pandas(
+        df, schema=to_arrow_schema(schema), preserve_index=False
+    )
 
-    # Convert DataFrame to records
-    records = df.to_dict("records")
 
-    # Handle nullable integers in records
-    for record in records:
-        for key, value in record.items():
-            if pd.isna(value):
-                record[key] = None
-            elif isinstance(value, pd.Timestamp):
-                record[key] = value.strftime("%Y-%m-%d")
-            elif isinstance(value, pd.Int64Dtype):
-                record[key] = int(value) if pd.notna(value) else None
+def upload_parquet(buffer, table_id, schema):
+    """Load an in-memory Parquet buffer into BigQuery with one append job."""
+    client = connect_to_bigquery()
 
     # Configure the load job
     job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
         write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
         schema=schema,
     )
 
+    job = client.load_table_from_file(buffer, table_id, job_config=job_config)
+    job.result()  # Wait for the job to complete
+
+
+def upload_to_bigquery(
+    df, table_id, table_type, schema, dry_run=True, logger=None, staging_dir=None
+):
+    """Upload the transformed data to BigQuery, or stage it when staging_dir
+    is given."""
     if dry_run:
         try:
-            # Check if data types match expected schema
-            current_types = df.dtypes.to_dict()
-            type_matches = True  # Detailed type checking would go here
+            # Converting to the upload's Arrow schema is the type check: it
+            # fails if a column is missing or can't be cast to its BigQuery type
+            try:
+                to_arrow_table(df, schema)
+                type_matches = True
+            except (KeyError, pa.ArrowInvalid, pa.ArrowTypeError):
+                type_matches = False
 
             if type_matches:
+                # One aggregation call for the summary figures
+                stats = df.agg(
+                    {
+                        "date": ["min", "max"],
+                        "survey_ID": "nunique",
+                        "grid_point": "nunique",
+                    }
+                )
                 summary = [
                     f"\nDry run successful - {len(df)} rows would be uploaded to {table_id}",
                     "Data schema and types are valid",
                     f"\nUpload Summary for {table_type} (Dry Run):",
                     f"Total rows: {len(df)}",
-                    f"Unique survey_IDs: {df['survey_ID'].nunique()}",
-                    f"Date range: {df['date'].min().strftime('%Y-%m-%d')} to {df['date'].max().strftime('%Y-%m-%d')}",
-                    f"Unique grid points: {df['grid_point'].nunique()}",
+                    f"Unique survey_IDs: {int(stats.at['nunique', 'survey_ID'])}",
+                    f"Date range: {stats.at['min', 'date'].strftime('%Y-%m-%d')} to {stats.at['max', 'date'].strftime('%Y-%m-%d')}",
+                    f"Unique grid points: {int(stats.at['nunique', 'grid_point'])}",
                     "\nSample of data that would be uploaded:",
                     str(df.head()),
                 ]
@@ -353,15 +533,22 @@ def upload_to_bigquery(df, table_id, table_type, schema, dry_run=True, logger=No
             logger.info(f"Total rows to upload: {len(df)}")
             logger.info(f"Date range: {df['date'].min()} to {df['date'].max()}")
 
-            # Add debug info for all fields
-            for col in df.columns:
-                logger.info(f"{col} type: {df[col].dtype}")
-                if df[col].dtype in ["int32", "Int32", "int64", "Int64"]:
-                    logger.info(f"First few {col} values:\n{df[col].head()}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Column types:\n%s", df.dtypes.to_string())
+                logger.debug("First few rows:\n%s", df.head().to_string())
+
+            # Serialize to an in-memory Parquet buffer
+            buffer = io.BytesIO()
+            pq.write_table(to_arrow_table(df, schema), buffer, compression="snappy")
+            buffer.seek(0)
 
-            # Use records instead of DataFrame
-            job = client.load_table_from_json(records, table_id, job_config=job_config)
-            job.result()
+            # Staged data is backed up and loaded later by flush_staging.py
+            if staging_dir:
+                staged_path = stage_parquet(buffer, table_id, staging_dir)
+                logger.info(f"Staged {len(df)} rows to {staged_path}")
+                return
+
+            upload_parquet(buffer, table_id, schema)
 
             logger.info(f"Successfully uploaded {len(df)} rows to BigQuery")
             logger.info("Upload completed successfully")
@@ -377,7 +564,7 @@ def upload_to_bigquery(df, table_id, table_type, schema, dry_run=True, logger=No
 
 def backup_table(table_id, backup_bucket, table_type):
     """Backup BigQuery table to Cloud Storage."""
-    client = bigquery.Client()
+    client = connect_to_bigquery()
 
     # Create timestamp for backup file
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -400,11 +587,14 @@ def backup_table(table_id, backup_bucket, table_type):
         return False
 
 
-def process_ground_table(df, args, ground_schema):
-    """Process and upload ground cover data."""
+def process_ground_table(df_ground, args, ground_schema, backup_future=None):
+    """Validate and upload the transformed ground cover data.
+
+    backup_future, if given, is an already submitted backup_table call for the
+    ground table, used instead of backing it up here.
+    """
     print("\nProcessing ground cover data...")
-    df_ground = transform_ground_data(df)
-    ground_logger = setup_logging(args.ground_table, "ground")
+    ground_logger = setup_logging(args.ground_table, "ground", args.verbose)
     ground_logger.info("Starting ground cover data processing")
     ground_logger.info(f"Mode: {'DRY RUN' if args.dry_run else 'LIVE'}")
 
@@ -422,9 +612,16 @@ def process_ground_table(df, args, ground_schema):
                 logger=ground_logger,
             )
         else:
-            if args.backup_bucket:
-                print(f"\nCreating ground cover table backup...")
-                if not backup_table(args.ground_table, args.backup_bucket, "ground"):
+            # Staged data is backed up by flush_staging.py when it is loaded
+            if args.backup_bucket and not args.staging_dir:
+                if backup_future is not None:
+                    backed_up = backup_future.result()
+                else:
+                    print(f"\nCreating ground cover table backup...")
+                    backed_up = backup_table(
+                        args.ground_table, args.backup_bucket, "ground"
+                    )
+                if not backed_up:
                     print("Backup failed. Aborting upload.")
                     return False
 
@@ -435,6 +632,7 @@ def process_ground_table(df, args, ground_schema):
                 ground_schema,
                 dry_run=False,
                 logger=ground_logger,
+                staging_dir=args.staging_dir,
             )
         return True
     else:
@@ -442,44 +640,128 @@ def process_ground_table(df, args, ground_schema):
         return False
 
 
+def stream_to_parquet(chunksize, columns, transform, validate, schema, logger):
+    """Transform and validate one table's columns chunk by chunk into Parquet.
+
+    Returns the buffer, the number of rows written and whether every chunk
+    passed validation.
+    """
+    buffer = io.BytesIO()
+    total_rows = 0
+    valid = True
+
+    with pq.ParquetWriter(
+        buffer, to_arrow_schema(schema), compression="snappy"
+    ) as writer:
+        for chunk in load_data_chunks(chunksize, columns):
+            chunk_transformed = transform(chunk)
+            valid = validate(chunk_transformed, logger=logger) and valid
+            writer.write_table(to_arrow_table(chunk_transformed, schema))
+            total_rows += len(chunk_transformed)
+
+    buffer.seek(0)
+    return buffer, total_rows, valid
+
+
+def stream_table(args, table_id, table_type, columns, transform, validate, schema):
+    """Stream one table from the CSV in chunks and upload it, keeping memory flat.
+
+    Returns whether the table was uploaded.
+    """
+    print(f"\nStreaming {table_type} data in chunks of {args.chunk_size} rows...")
+    logger = setup_logging(table_id, table_type, args.verbose)
+    logger.info(f"Starting streamed {table_type} data processing")
+
+    buffer, total_rows, valid = stream_to_parquet(
+        args.chunk_size, columns, transform, validate, schema, logger
+    )
+
+    if not valid:
+        print(f"{table_type.capitalize()} data validation failed.")
+        return False
+
+    print(f"\n{table_type.capitalize()} data validation passed!")
+
+    # Staged data is backed up and loaded later by flush_staging.py
+    if args.staging_dir:
+        stage_parquet(buffer, table_id, args.staging_dir)
+        logger.info(f"Staged {total_rows} rows for {table_id}")
+        return True
+
+    if args.backup_bucket:
+        print(f"\nCreating {table_type} table backup...")
+        if not backup_table(table_id, args.backup_bucket, table_type):
+            print("Backup failed. Aborting upload.")
+            return False
+
+    try:
+        logger.info(f"Starting streamed upload to {table_id}")
+        logger.info(f"Total rows to upload: {total_rows}")
+
+        upload_parquet(buffer, table_id, schema)
+
+        logger.info(f"Successfully uploaded {total_rows} rows to BigQuery")
+        print(f"\nSuccessfully uploaded {total_rows} rows to BigQuery")
+        return True
+    except Exception as e:
+        logger.error(f"Error uploading to BigQuery: {e}")
+        print(f"Error uploading to BigQuery: {e}")
+        return False
+
+
 def main():
     # Parse command line arguments
     args = parse_args()
 
-    # Load the data
+    process_ground = not args.skip_ground_table and args.ground_table
+
+    # Dry runs preview the full frames; only real uploads are streamed. Each
+    # table re-reads just its own columns, ground only after vegetation loads
+    if args.chunk_size and not args.dry_run:
+        if not stream_table(
+            args,
+            args.vegetation_table,
+            "vegetation",
+            VEGETATION_COLUMNS,
+            transform_vegetation_data,
+            validate_vegetation_data,
+            VEGETATION_SCHEMA,
+        ):
+            sys.exit(1)  # Force exit on error
+
+        if process_ground:
+            stream_table(
+                args,
+                args.ground_table,
+                "ground",
+                GROUND_COLUMNS,
+                transform_ground_data,
+                validate_ground_data,
+                GROUND_SCHEMA,
+            )
+        return
+
+    # Load the data. Ground cover is only built for real uploads, so a dry run
+    # or a vegetation-only run never reads GroundCover
     print("Loading data...")
-    df = load_data()
-
-    # Define schemas
-    vegetation_schema = [
-        bigquery.SchemaField("survey_ID", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("grid_point", "INTEGER", mode="NULLABLE"),
-        bigquery.SchemaField("date", "DATE", mode="NULLABLE"),
-        bigquery.SchemaField("year", "INTEGER", mode="NULLABLE"),
-        bigquery.SchemaField("transect_point", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("height_intercept_1", "NUMERIC", mode="NULLABLE"),
-        bigquery.SchemaField("intercept_1", "INTEGER", mode="NULLABLE"),
-        bigquery.SchemaField("intercept_2", "INTEGER", mode="NULLABLE"),
-        bigquery.SchemaField("intercept_3", "INTEGER", mode="NULLABLE"),
-        bigquery.SchemaField("intercept_4", "INTEGER", mode="NULLABLE"),
-    ]
-
-    ground_schema = [
-        bigquery.SchemaField("survey_ID", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("grid_point", "INTEGER", mode="NULLABLE"),
-        bigquery.SchemaField("date", "DATE", mode="NULLABLE"),
-        bigquery.SchemaField("year", "INTEGER", mode="NULLABLE"),
-        bigquery.SchemaField("transect_point", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("intercept_1", "INTEGER", mode="NULLABLE"),
-        bigquery.SchemaField("intercept_ground_code", "STRING", mode="NULLABLE"),
-    ]
+    build_ground = process_ground and not args.dry_run
+    df = load_data(
+        {**VEGETATION_COLUMNS, **GROUND_COLUMNS} if build_ground else VEGETATION_COLUMNS
+    )
+
+    # Split off the source columns each transform maps and drop the combined
+    # frame, so each column is only referenced by the tables that upload it
+    df_veg_source = df[list(VEGETATION_COLUMNS)]
+    df_ground_source = df[list(GROUND_COLUMNS)] if build_ground else None
+    del df
 
     # Process vegetation table first
     print("\nProcessing vegetation data...")
-    df_veg = transform_vegetation_data(df)
-    veg_logger = setup_logging(args.vegetation_table, "vegetation")
+    veg_logger = setup_logging(args.vegetation_table, "vegetation", args.verbose)
     veg_logger.info("Starting vegetation data processing")
     veg_logger.info(f"Mode: {'DRY RUN' if args.dry_run else 'LIVE'}")
+    df_veg = transform_vegetation_data(df_veg_source, veg_logger)
+    del df_veg_source
 
     if not validate_vegetation_data(df_veg, logger=veg_logger):
         print("Vegetation data validation failed.")
@@ -493,35 +775,59 @@ def main():
             df_veg,
             args.vegetation_table,
             "vegetation",
-            vegetation_schema,
+            VEGETATION_SCHEMA,
             dry_run=True,
             logger=veg_logger,
         )
     else:
-        if args.backup_bucket:
-            print(f"\nCreating vegetation table backup...")
-            if not backup_table(
-                args.vegetation_table, args.backup_bucket, "vegetation"
-            ):
-                print("Backup failed. Aborting upload.")
-                return
-
-        try:
-            upload_to_bigquery(
-                df_veg,
-                args.vegetation_table,
-                "vegetation",
-                vegetation_schema,
-                dry_run=False,
-                logger=veg_logger,
-            )
-        except Exception as e:
-            print(f"Vegetation upload failed: {e}")
-            sys.exit(1)  # Force exit on error
-
-        # Only process ground table if vegetation succeeded
-        if not args.skip_ground_table and args.ground_table:
-            process_ground_table(df, args, ground_schema)
+        # Build the ground cover frame and back up the ground table in worker
+        # threads while the vegetation table is backed up and uploaded, which
+        # is mostly waiting on BigQuery. The ground upload itself still waits
+        # for the vegetation upload to succeed
+        ground_backup_future = None
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            if process_ground:
+                ground_future = executor.submit(transform_ground_data, df_ground_source)
+                del df_ground_source
+                if args.backup_bucket and not args.staging_dir:
+                    print(f"\nCreating ground cover table backup...")
+                    ground_backup_future = executor.submit(
+                        backup_table, args.ground_table, args.backup_bucket, "ground"
+                    )
+
+            if args.backup_bucket and not args.staging_dir:
+                print(f"\nCreating vegetation table backup...")
+                if not backup_table(
+                    args.vegetation_table, args.backup_bucket, "vegetation"
+                ):
+                    print("Backup failed. Aborting upload.")
+                    return
+
+            try:
+                upload_to_bigquery(
+                    df_veg,
+                    args.vegetation_table,
+                    "vegetation",
+                    VEGETATION_SCHEMA,
+                    dry_run=False,
+                    logger=veg_logger,
+                    staging_dir=args.staging_dir,
+                )
+            except Exception as e:
+                print(f"Vegetation upload failed: {e}")
+                sys.exit(1)  # Force exit on error
+
+            # Release the vegetation frame before the ground upload
+            del df_veg
+
+            # Only process ground table if vegetation succeeded
+            if process_ground:
+                process_ground_table(
+                    ground_future.result(),
+                    args,
+                    GROUND_SCHEMA,
+                    backup_future=ground_backup_future,
+                )
 
 
 if __name__ == "__main__":
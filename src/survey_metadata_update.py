@@ -1,10 +1,63 @@
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pacsv
 from pathlib import Path
 from google.cloud import bigquery
 import argparse
 from datetime import datetime
+import functools
 import logging
 
+from parquet_cache import prepare_parquet
+
+
+SOURCE_FILE = (
+    Path(__file__).parents[2]
+    / "data/external/2024-10-21_gridVeg_survey_metadata_SOURCE.csv"
+)
+
+# Typed Parquet copy of SOURCE_FILE, rebuilt whenever the CSV or the way it is
+# parsed changes
+PARQUET_CACHE = (
+    Path(__file__).parents[2]
+    / "data/interim/2024-10-21_gridVeg_survey_metadata.parquet"
+)
+
+# Arrow types of the source CSV columns, so the parser never has to infer them
+SOURCE_COLUMN_TYPES = {
+    "__kp_Survey": pa.string(),
+    "_kf_Site": pa.int64(),
+    "SurveyYear": pa.int64(),
+    "SurveyDate": pa.timestamp("s"),
+    "Surveyor1": pa.string(),
+}
+
+# Arrow CSV options for the source: only the known columns, typed up front; the
+# export writes dates as m/d/yy and leaves missing values empty
+SOURCE_CONVERT_OPTIONS = {
+    "column_types": SOURCE_COLUMN_TYPES,
+    "include_columns": list(SOURCE_COLUMN_TYPES),
+    "timestamp_parsers": ["%m/%d/%y"],
+    "null_values": ["", "NA"],
+    "strings_can_be_null": True,
+}
+
+# BigQuery schema of the survey metadata table
+SCHEMA = [
+    bigquery.SchemaField("survey_ID", "STRING", mode="NULLABLE"),
+    bigquery.SchemaField("grid_point", "INTEGER", mode="NULLABLE"),
+    bigquery.SchemaField("year", "INTEGER", mode="NULLABLE"),
+    bigquery.SchemaField("date", "DATE", mode="NULLABLE"),
+    bigquery.SchemaField("survey_sequence", "STRING", mode="NULLABLE"),
+    bigquery.SchemaField("surveyor", "STRING", mode="NULLABLE"),
+]
+
+
+@functools.cache
+def connect_to_bigquery():
+    """Create a BigQuery client, reused for the rest of the process"""
+    return bigquery.Client()
+
 
 def setup_logging(table_id):
     """Setup logging for BigQuery updates."""
@@ -32,51 +85,58 @@ def setup_logging(table_id):
     return logger
 
 
-def load_data():
-    """Load the survey metadata from CSV file."""
-    file_path = (
-        Path(__file__).parents[2]
-        / "data/external/2024-10-21_gridVeg_survey_metadata_SOURCE.csv"
+def read_source_csv():
+    """Read the survey metadata source CSV."""
+    # Arrow's multithreaded reader, typed by SOURCE_CONVERT_OPTIONS
+    table = pacsv.read_csv(
+        SOURCE_FILE, convert_options=pacsv.ConvertOptions(**SOURCE_CONVERT_OPTIONS)
     )
-    df = pd.read_csv(file_path)
+    df = table.to_pandas(types_mapper=pd.ArrowDtype)
     return df
 
 
+def prepare_source_parquet():
+    """Convert the source CSV to a typed Parquet file unless it is up to date."""
+    return prepare_parquet(
+        SOURCE_FILE, PARQUET_CACHE, read_source_csv, SOURCE_CONVERT_OPTIONS
+    )
+
+
+def load_data():
+    """Load the survey metadata from its Parquet copy of the CSV."""
+    return pd.read_parquet(
+        prepare_source_parquet(), engine="pyarrow", dtype_backend="pyarrow"
+    )
+
+
 def transform_data(df):
     """Transform the data to match BigQuery schema."""
-    df_transformed = df.copy()
-
-    # Rename columns
-    df_transformed = df_transformed.rename(
+    # Rename columns. The renamed frame shares data with df; the steps below
+    # only replace whole columns, so the caller's frame is left untouched
+    df_transformed = df.rename(
         columns={
             "__kp_Survey": "survey_ID",
             "_kf_Site": "grid_point",
             "SurveyYear": "year",
             "SurveyDate": "date",
             "Surveyor1": "surveyor",
-        }
+        },
+        copy=False,
     )
 
     # Convert date format
     df_transformed["date"] = pd.to_datetime(df_transformed["date"])
 
-    # Convert numeric fields
-    df_transformed["year"] = pd.to_numeric(df_transformed["year"])
-    df_transformed["grid_point"] = pd.to_numeric(df_transformed["grid_point"])
+    # Convert numeric fields (skipped when read_csv already typed them)
+    for col in ["year", "grid_point"]:
+        if not pd.api.types.is_numeric_dtype(df_transformed[col]):
+            df_transformed[col] = pd.to_numeric(df_transformed[col])
 
     # Set survey_sequence equal to year
     df_transformed["survey_sequence"] = df_transformed["year"].astype(str)
 
     # Reorder columns to match schema
-    columns_order = [
-        "survey_ID",
-        "grid_point",
-        "year",
-        "date",
-        "survey_sequence",
-        "surveyor",
-    ]
-    df_transformed = df_transformed[columns_order]
+    df_transformed = df_transformed[[field.name for field in SCHEMA]]
 
     return df_transformed
 
@@ -116,20 +176,10 @@ def validate_data(df, logger):
 
 def upload_to_bigquery(df, table_id, dry_run=True, logger=None):
     """Upload the transformed data to BigQuery."""
-    client = bigquery.Client()
-
-    # Define schema
-    schema = [
-        bigquery.SchemaField("survey_ID", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("grid_point", "INTEGER", mode="NULLABLE"),
-        bigquery.SchemaField("year", "INTEGER", mode="NULLABLE"),
-        bigquery.SchemaField("date", "DATE", mode="NULLABLE"),
-        bigquery.SchemaField("survey_sequence", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("surveyor", "STRING", mode="NULLABLE"),
-    ]
+    client = connect_to_bigquery()
 
     job_config = bigquery.LoadJobConfig(
-        schema=schema,
+        schema=SCHEMA,
         write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
     )
 
@@ -159,15 +209,11 @@ def upload_to_bigquery(df, table_id, dry_run=True, logger=None):
                 logger.error(error_msg)
     else:
         try:
-            # Convert DataFrame to records
-            records = df.to_dict("records")
-
-            # Handle date conversion
-            for record in records:
-                if isinstance(record["date"], pd.Timestamp):
-                    record["date"] = record["date"].strftime("%Y-%m-%d")
-
-            job = client.load_table_from_json(records, table_id, job_config=job_config)
+            # Serialized to Parquet via Arrow against the schema, so the
+            # datetime column is written as DATE without per-row conversion
+            job = client.load_table_from_dataframe(
+                df, table_id, job_config=job_config
+            )
             job.result()
 
             logger.info(f"Successfully uploaded {len(df)} rows to BigQuery")
@@ -201,7 +247,7 @@ def parse_args():
 
 def backup_table(table_id, backup_bucket):
     """Backup BigQuery table to Cloud Storage."""
-    client = bigquery.Client()
+    client = connect_to_bigquery()
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     table_name = table_id.split(".")[-1]